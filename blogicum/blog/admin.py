@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Category, Location, Post, Comment
+from . import stamps
+from .querycache import cached
+from .models import Category, Location, Post, Comment, Task
 
 
 @admin.register(Category)
@@ -7,6 +9,24 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ('title', 'is_published', 'created_at')
     list_filter = ('is_published',)
     search_fields = ('title', 'description')
+    actions = ('publish', 'unpublish')
+
+    def _set_published(self, queryset, value):
+        # update() не отправляет сигналы: страницы с постами этих
+        # категорий сбрасываем сами.
+        keys = set()
+        for category in queryset:
+            keys |= stamps.category_change_keys(category)
+        queryset.update(is_published=value)
+        stamps.changed(*keys, site=True)
+
+    @admin.action(description='Опубликовать выбранные категории')
+    def publish(self, request, queryset):
+        self._set_published(queryset, True)
+
+    @admin.action(description='Снять с публикации выбранные категории')
+    def unpublish(self, request, queryset):
+        self._set_published(queryset, False)
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
@@ -19,9 +39,24 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('is_published', 'category', 'author')
     search_fields = ('title', 'text')
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Списки выбора категории и места строятся на каждой странице
+        # редактирования: берём их из кеша запросов. Пользователей в
+        # общем кеше не держим.
+        if db_field.name in ('category', 'location'):
+            kwargs.setdefault(
+                'queryset',
+                cached(db_field.remote_field.model._default_manager),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'post', 'created_at')
     list_filter = ('created_at', 'author')
 
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'run_at', 'attempts')
+    list_filter = ('status', 'name')
@@ -0,0 +1,186 @@
+"""Автомат защиты от недоступной базы и режим «только чтение».
+
+Ошибки перегрузки базы (SQLite занята, заблокирована или недоступна)
+считаются в окне BREAKER_WINDOW секунд. После
+BREAKER_FAILURE_THRESHOLD ошибок автомат размыкается: публичные
+страницы (декоратор serve_stale) отдаются из последней удачной версии
+в кеше без обращения к базе, а запись вежливо отклоняется
+(CircuitBreakerMiddleware). Через BREAKER_RESET_TIMEOUT секунд один
+запрос пропускается к базе на пробу: удача замыкает автомат, ошибка
+размыкает снова.
+
+Запрос, прерванный бюджетом времени (blogicum.querybudget), говорит о
+медленной странице, а не о базе, и автомат не трогает: декоратор
+query_budget стоит внутри serve_stale и сам отвечает 503.
+
+Последнюю удачную версию страницы сохраняет cache_page_with_holes при
+каждом пересчёте. Метки персональных фрагментов в ней заполняются как
+для анонимного пользователя: сессии и пользователи живут в той же базе.
+
+Состояние у каждого процесса своё. Счётчики — breaker.*.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.utils.cache import add_never_cache_headers
+
+from blogicum import metrics, querybudget
+
+from .cache import SAFE_METHODS, fill_holes, last_good_key
+
+OVERLOAD_MESSAGES = (
+    'database is locked', 'database table is locked', 'busy',
+    'unable to open database', 'disk i/o error',
+)
+READ_ONLY_BANNER = (
+    '<div class="alert alert-warning text-center mb-0">'
+    'Сайт временно работает в режиме только для чтения: показана '
+    'сохранённая версия страницы.</div>'
+)
+READ_ONLY_BODY = (
+    '<!doctype html><title>Только чтение</title>'
+    '<h1>Сайт временно работает только для чтения</h1>'
+    '<p>Изменения сейчас не сохраняются. Попробуйте через минуту.</p>'
+)
+
+# trial — время начала пробного запроса: пробу, не дошедшую до
+# результата, через BREAKER_RESET_TIMEOUT сменит следующая.
+_state = {'failures': [], 'opened': None, 'trial': None}
+_lock = threading.Lock()
+
+
+def is_overload(error):
+    if not isinstance(error, DatabaseError):
+        return False
+    message = str(error).lower()
+    return any(text in message for text in OVERLOAD_MESSAGES)
+
+
+def record_failure():
+    now = time.monotonic()
+    with _lock:
+        failures = [moment for moment in _state['failures']
+                    if now - moment < settings.BREAKER_WINDOW]
+        failures.append(now)
+        _state['failures'] = failures
+        if (_state['trial'] is not None
+                or len(failures) >= settings.BREAKER_FAILURE_THRESHOLD):
+            if _state['opened'] is None:
+                metrics.incr('breaker.opened')
+            _state.update(opened=now, trial=None)
+
+
+def record_success():
+    with _lock:
+        if _state['trial'] is not None:
+            metrics.incr('breaker.closed')
+            _state.update(failures=[], opened=None, trial=None)
+
+
+def is_open():
+    return _state['opened'] is not None
+
+
+def allow_request():
+    """Можно ли идти в базу: автомат замкнут или это пробный запрос."""
+    opened = _state['opened']
+    if opened is None:
+        return True
+    now = time.monotonic()
+    if now - opened < settings.BREAKER_RESET_TIMEOUT:
+        return False
+    with _lock:
+        if _state['opened'] is None:
+            return True
+        trial = _state['trial']
+        if (trial is not None
+                and now - trial < settings.BREAKER_RESET_TIMEOUT):
+            return False
+        _state['trial'] = now
+        return True
+
+
+def reset():
+    with _lock:
+        _state.update(failures=[], opened=None, trial=None)
+
+
+def probe():
+    """Чтение настоящей таблицы — проверка базы для пробного запроса."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        cursor.fetchone()
+
+
+def call_if_closed(func):
+    """Служебная работа с базой вне представлений (в middleware).
+
+    При разомкнутом автомате пропускается, ошибки перегрузки
+    считаются автоматом вместо ответа 500.
+    """
+    if is_open():
+        return None
+    try:
+        return func()
+    except DatabaseError as error:
+        if not is_overload(error):
+            raise
+        record_failure()
+        return None
+
+
+def stale_response(request):
+    """Последняя удачная версия страницы или готовый 503."""
+    try:
+        content = cache.get(last_good_key(request))
+    except Exception:
+        content = None
+    if content is None:
+        metrics.incr('breaker.unavailable')
+        return querybudget.unavailable()
+    request.user = AnonymousUser()
+    request._cached_user = request.user
+    content = fill_holes(request, content).replace(
+        '<body>', '<body>' + READ_ONLY_BANNER, 1
+    )
+    response = HttpResponse(content)
+    response['Warning'] = '110 - "Response is Stale"'
+    add_never_cache_headers(response)
+    metrics.incr('breaker.stale')
+    return response
+
+
+def read_only_response():
+    response = HttpResponse(READ_ONLY_BODY, status=503)
+    response['Retry-After'] = str(settings.BREAKER_RESET_TIMEOUT)
+    return response
+
+
+def serve_stale(view):
+    """Декоратор публичной страницы: при недоступной базе — копия."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        if not allow_request():
+            return stale_response(request)
+        try:
+            if is_open():
+                # Пробный запрос решается запросом к базе, а не тем,
+                # нашлась ли страница в кеше.
+                probe()
+            response = view(request, *args, **kwargs)
+        except DatabaseError as error:
+            if not is_overload(error):
+                raise
+            record_failure()
+            return stale_response(request)
+        record_success()
+        return response
+    return wrapper
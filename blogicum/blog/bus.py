@@ -0,0 +1,150 @@
+"""Шина инвалидации между воркерами и узлами.
+
+Сигналы моделей публикуют ключи изменившихся данных (post:42,
+category:travel, feed:index, author:<username>, location:<id>) в
+журнал — таблицу InvalidationEvent в общей базе. Каждый процесс
+читает журнал с места, где остановился (курсор — последний
+прочитанный id), не чаще раза в INVALIDATION_POLL_INTERVAL секунд и
+передаёт ключи подписчикам, которые сбрасывают свои копии данных.
+
+С отдельной базой комментариев (blog.comments) события об изменении
+комментариев пишутся в журнал этой базы, чтобы комментарий не ждал
+блокировки записи основной; курсор у каждого журнала свой.
+
+Журнал хранится INVALIDATION_JOURNAL_TTL секунд. Процесс, который
+не читал журнал дольше, мог пропустить события и получает ключ ALL —
+подписчик должен сбросить всё.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from .models import InvalidationEvent
+
+ALL = '*'
+BATCH_SIZE = 1000
+
+_subscribers = []
+_state = {'cursors': {}, 'polled': 0.0, 'pruned': 0.0}
+_lock = threading.Lock()
+
+
+def subscribe(handler):
+    """Регистрирует handler(keys); можно использовать как декоратор."""
+    if handler not in _subscribers:
+        _subscribers.append(handler)
+    return handler
+
+
+def unsubscribe(handler):
+    if handler in _subscribers:
+        _subscribers.remove(handler)
+
+
+def dispatch(keys):
+    keys = set(keys)
+    if not keys:
+        return
+    for handler in list(_subscribers):
+        handler(keys)
+
+
+def aliases():
+    """Базы с журналом: основная и база комментариев."""
+    return sorted({DEFAULT_DB_ALIAS, settings.COMMENTS_DATABASE})
+
+
+def publish(*keys, using=None):
+    """Записывает ключи в журнал и сразу сбрасывает их в этом процессе.
+
+    Запись идёт в той же транзакции, что и изменение данных, если
+    using — база этих данных: при откате события пропадут вместе с ним.
+    Собственные события процесс потом прочитает ещё раз — сброс копий
+    идемпотентен.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    InvalidationEvent.objects.using(using).bulk_create(
+        [InvalidationEvent(key=key) for key in keys]
+    )
+    dispatch(keys)
+
+
+def poll(force=False):
+    """Читает новые события журнала; возвращает число ключей."""
+    now = time.monotonic()
+    interval = settings.INVALIDATION_POLL_INTERVAL
+    if not force and now - _state['polled'] < interval:
+        return 0
+    if not _lock.acquire(blocking=False):
+        # Журнал уже читает соседний поток.
+        return 0
+    try:
+        missed = (_state['polled']
+                  and now - _state['polled']
+                  > settings.INVALIDATION_JOURNAL_TTL)
+        _state['polled'] = now
+        if missed:
+            _state['cursors'] = {alias: latest_id(alias)
+                                 for alias in aliases()}
+            dispatch([ALL])
+            return 1
+        keys = set()
+        for alias in aliases():
+            keys.update(_read(alias))
+        dispatch(keys)
+        if now - _state['pruned'] > settings.INVALIDATION_JOURNAL_TTL:
+            _state['pruned'] = now
+            for alias in aliases():
+                prune(alias)
+        return len(keys)
+    finally:
+        _lock.release()
+
+
+def _read(alias):
+    cursors = _state['cursors']
+    if alias not in cursors:
+        # Свежий процесс: своих копий у него ещё нет.
+        cursors[alias] = latest_id(alias)
+        return set()
+    keys = set()
+    while True:
+        events = list(
+            InvalidationEvent.objects.using(alias)
+            .filter(id__gt=cursors[alias])
+            .order_by('id').values_list('id', 'key')[:BATCH_SIZE]
+        )
+        if not events:
+            return keys
+        cursors[alias] = events[-1][0]
+        keys.update(key for _, key in events)
+        if len(events) < BATCH_SIZE:
+            return keys
+
+
+def latest_id(alias=DEFAULT_DB_ALIAS):
+    last = InvalidationEvent.objects.using(alias).order_by(
+        '-id'
+    ).values_list('id', flat=True).first()
+    return last or 0
+
+
+def prune(alias=DEFAULT_DB_ALIAS):
+    """Удаляет события старше INVALIDATION_JOURNAL_TTL."""
+    border = timezone.now() - timedelta(
+        seconds=settings.INVALIDATION_JOURNAL_TTL
+    )
+    InvalidationEvent.objects.using(alias).filter(
+        created_at__lt=border
+    ).delete()
+
+
+def reset():
+    """Забывает курсоры: следующий poll() начнёт с конца журналов."""
+    _state.update(cursors={}, polled=0.0, pruned=0.0)
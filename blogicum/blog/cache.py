@@ -0,0 +1,371 @@
+"""Кеширование страниц блога с «дырами» под данные пользователя.
+
+Страница рендерится один раз и кешируется общей для всех: вместо
+фрагментов, зависящих от пользователя (кнопки в шапке, форма
+комментария, ссылки редактирования), в ней стоят метки. На каждый
+запрос метки заменяются отрендеренными маленькими шаблонами.
+
+Страница помечается тегами — ключами данных, которые на ней видны
+(post:<id>, category:<slug>, author:<username>, location:<id>,
+feed:index). Теги отдаются в заголовке Surrogate-Key, а purge(*tags)
+делает недействительными все страницы с этими тегами: у каждого тега
+есть версия в кеше, запись страницы хранит версии на момент рендеринга
+и при расхождении считается промахом.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from . import bus
+
+SAFE_METHODS = ('GET', 'HEAD')
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+# Тег, который есть у каждой страницы: purge(SITE_TAG) сбрасывает все.
+SITE_TAG = 'site'
+HOLE_RE = re.compile(r'<!--hole (\{.*?\})-->')
+# Значение блокировки, когда пересчёт не дал значения для кеша
+# (страница 404, персональная, ошибка): ждать соседа незачем.
+UNCACHEABLE = 'uncacheable'
+UNCACHEABLE_TIMEOUT = 5
+
+
+def make_hole(template_name, context):
+    """Метка на месте фрагмента; context должен сериализоваться в JSON."""
+    payload = json.dumps(
+        {'template': template_name, 'context': context},
+        sort_keys=True, ensure_ascii=False,
+    ).replace('>', '\\u003e')
+    return f'<!--hole {payload}-->'
+
+
+def fill_holes(request, content):
+    """Рендерит фрагменты для текущего запроса и подставляет их."""
+    rendered = {}
+
+    def replace(match):
+        payload = match.group(1)
+        if payload not in rendered:
+            hole = json.loads(payload)
+            rendered[payload] = render_to_string(
+                hole['template'], hole['context'], request
+            )
+        return rendered[payload]
+
+    return HOLE_RE.sub(replace, content)
+
+
+def _store(key, value, timeout, stale_timeout):
+    cache.set(key, (value, time.time() + timeout), timeout + stale_timeout)
+
+
+def _refresh_in_background(key, compute, timeout, stale_timeout, lock_key):
+    def run():
+        try:
+            _store(key, compute(), timeout, stale_timeout)
+        finally:
+            cache.delete(lock_key)
+            # Соединения с БД в потоке свои, закрываем их сами.
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _lookup(key, is_valid):
+    entry = cache.get(key)
+    if entry is not None and is_valid and not is_valid(entry[0]):
+        return None
+    return entry
+
+
+def _compute_locked(key, compute, timeout, stale_timeout, lock_key):
+    try:
+        value = compute()
+    except BaseException:
+        # Ждущие воркеры сразу считают сами, а новые запросы
+        # UNCACHEABLE_TIMEOUT секунд не встают в очередь за блокировкой.
+        cache.set(lock_key, UNCACHEABLE, UNCACHEABLE_TIMEOUT)
+        raise
+    try:
+        _store(key, value, timeout, stale_timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def _lock_state(lock_key):
+    # Мимо L1 многоуровневого кеша: там блокировка соседа видна
+    # с опозданием.
+    return getattr(cache, 'l2', cache).get(lock_key)
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=0, lock_timeout=10,
+                   wait=2.0, background=True, is_valid=None):
+    """Значение из кеша или compute() — но только в одном воркере.
+
+    Значение свежее timeout секунд и ещё stale_timeout секунд хранится
+    устаревшим. Пересчитывает тот, кто взял короткую блокировку
+    (cache.add); остальные отдают устаревшее значение, а если его нет —
+    ждут до wait секунд или пока считающий не сообщит, что значения
+    для кеша не будет (compute() выбросила исключение). background=True
+    обновляет устаревшее значение в отдельном потоке, не задерживая
+    текущий запрос; compute в этом случае не должна зависеть от
+    запроса. Значение, для которого
+    is_valid(value) ложно, считается отсутствующим — даже устаревшим
+    его не отдают.
+    """
+    lock_key = f'lock:{key}'
+    entry = _lookup(key, is_valid)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+            return value
+        if cache.add(lock_key, 1, lock_timeout):
+            if background:
+                _refresh_in_background(
+                    key, compute, timeout, stale_timeout, lock_key
+                )
+            else:
+                value = _compute_locked(
+                    key, compute, timeout, stale_timeout, lock_key
+                )
+        return value
+
+    if cache.add(lock_key, 1, lock_timeout):
+        return _compute_locked(key, compute, timeout, stale_timeout, lock_key)
+
+    deadline = time.monotonic() + wait
+    while (time.monotonic() < deadline
+           and _lock_state(lock_key) not in (None, UNCACHEABLE)):
+        time.sleep(0.05)
+        entry = _lookup(key, is_valid)
+        if entry is not None:
+            return entry[0]
+    # Соседний воркер не успел или значения для кеша нет: считаем сами,
+    # но в кеш не пишем.
+    return compute()
+
+
+def feed_cache_key(key):
+    """Ключ кеша для списка id постов ленты с ключом данных key."""
+    return f'ids:{key}'
+
+
+def tag_cache_key(tag):
+    return f'tag:{tag}'
+
+
+def add_cache_tags(request, *tags):
+    """Отмечает, что ответ на запрос зависит от данных под тегами."""
+    if not hasattr(request, 'cache_tags'):
+        request.cache_tags = {SITE_TAG}
+    request.cache_tags.update(tags)
+
+
+def post_cache_tags(post):
+    """Теги данных поста, которые видны в его карточке."""
+    tags = {f'post:{post.pk}'}
+    if post.author_id:
+        tags.add(f'author:{post.author.username}')
+    if post.category_id:
+        tags.add(f'category:{post.category.slug}')
+    if post.location_id:
+        tags.add(f'location:{post.location_id}')
+    return tags
+
+
+def add_post_tags(request, posts):
+    for post in posts:
+        add_cache_tags(request, *post_cache_tags(post))
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; недостающие заводятся заново."""
+    keys = {tag_cache_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def current_tag_versions(tags):
+    """Версии тегов без создания недостающих (None — тега нет)."""
+    tags = set(tags)
+    found = cache.get_many([tag_cache_key(tag) for tag in tags])
+    return {tag: found.get(tag_cache_key(tag)) for tag in tags}
+
+
+def tags_current(versions, current=None):
+    """Совпадают ли сохранённые версии тегов с текущими.
+
+    current — заранее прочитанные current_tag_versions() для проверки
+    многих записей за одно обращение к кешу.
+    """
+    if not versions:
+        return True
+    if current is None:
+        current = current_tag_versions(versions)
+    return all(current.get(tag) == version
+               for tag, version in versions.items())
+
+
+def purge(*tags, using=None):
+    """Сбрасывает страницы, карточки и ленты с тегами во всех воркерах.
+
+    Вызывается из сигналов моделей и из действий админки, которые
+    меняют данные в обход сигналов (queryset.update()). using — база
+    журнала шины (см. bus.publish).
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    expire(*tags)
+    # Копии версий тегов в L1 воркеров сбросит шина.
+    bus.publish(*tags, using=using)
+
+
+def expire(*tags):
+    """Новые версии тегов в общем кеше без публикации в шину.
+
+    Копии версий в L1 других воркеров доживут до L1_TIMEOUT.
+    """
+    # Новая версия через set(), а не incr(): incr сбрасывает L1 всех
+    # воркеров целиком.
+    version = time.time_ns()
+    cache.set_many({tag_cache_key(tag): version for tag in tags}, None)
+    cache.delete_many([feed_cache_key(tag) for tag in tags])
+
+
+def drop_local_copies(keys):
+    """Подписчик шины: сбрасывает копии версий тегов и списков лент."""
+    if not hasattr(cache, 'drop_local'):
+        return
+    if bus.ALL in keys:
+        cache.clear_local()
+        return
+    for key in keys:
+        cache.drop_local(tag_cache_key(key))
+        cache.drop_local(feed_cache_key(key))
+
+
+def page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}'
+
+
+def last_good_key(request):
+    """Ключ последней удачной версии страницы (см. blog.breaker)."""
+    return 'good:' + page_key(request)
+
+
+def set_surrogate_keys(response, tags):
+    if tags:
+        response[SURROGATE_KEY_HEADER] = ' '.join(sorted(tags))
+
+
+class _NotShareable(Exception):
+    pass
+
+
+def _page_versions(request):
+    # replicas импортирует этот модуль.
+    from . import replicas
+
+    # Версии читаются после рендеринга: страница, собранная
+    # одновременно с purge(), проживёт до PAGE_CACHE_TIMEOUT.
+    versions = tag_versions(getattr(request, 'cache_tags', ()))
+    if not replicas.storable(versions):
+        # Собрана из реплики, отстающей от этих тегов.
+        raise _NotShareable
+    return versions
+
+
+def _uncached(request, bypass, args, kwargs):
+    from . import replicas
+
+    return (replicas.is_pinned()
+            or (bypass is not None and bypass(request, *args, **kwargs)))
+
+
+def cache_page_with_holes(bypass=None):
+    """Декоратор view: общий кеш страницы + персональные фрагменты.
+
+    Промах рендерит только один воркер (см. get_or_compute), после
+    истечения PAGE_CACHE_TIMEOUT страница ещё PAGE_CACHE_STALE_TIMEOUT
+    секунд отдаётся устаревшей, пока её обновляет один из воркеров.
+    Кешируются только ответы 200 без Cache-Control; view, отдающая
+    персональную страницу, помечает её patch_cache_control(private=True).
+    bypass(request, *args, **kwargs) → True отключает кеш для запроса,
+    если страница целиком зависит от пользователя. Теги, собранные view
+    через add_cache_tags(), хранятся вместе со страницей и отдаются в
+    заголовке Surrogate-Key. Запрос, закреплённый за основной базой
+    (blog.replicas), кеш не читает, а страница из отстающей реплики в
+    него не пишется.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if (not timeout or request.method not in SAFE_METHODS
+                    or _uncached(request, bypass, args, kwargs)):
+                response = view(request, *args, **kwargs)
+                set_surrogate_keys(
+                    response, getattr(request, 'cache_tags', ())
+                )
+                return response
+
+            rendered = []
+
+            def render_shared():
+                request.hole_punching = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    # Страницы ошибок рендерятся уже без меток.
+                    request.hole_punching = False
+                rendered.append(response)
+                if (response.streaming or response.status_code != 200
+                        or response.has_header('Cache-Control')):
+                    # Не для общего кеша: стоящие в очереди воркеры
+                    # посчитают страницу сами.
+                    raise _NotShareable
+                versions = _page_versions(request)
+                content = response.content.decode(response.charset)
+                # Копия на случай недоступной базы; пишется только при
+                # пересчёте страницы, а не на каждый запрос.
+                cache.set(last_good_key(request), content,
+                          settings.BREAKER_STALE_TIMEOUT)
+                return content, versions
+
+            try:
+                content, versions = get_or_compute(
+                    page_key(request), render_shared, timeout,
+                    stale_timeout=settings.PAGE_CACHE_STALE_TIMEOUT,
+                    background=False,
+                    is_valid=lambda page: tags_current(page[1]),
+                )
+            except _NotShareable:
+                response = rendered[0]
+                if not response.streaming:
+                    response.content = fill_holes(
+                        request, response.content.decode(response.charset)
+                    )
+                set_surrogate_keys(
+                    response, getattr(request, 'cache_tags', ())
+                )
+                return response
+            response = rendered[0] if rendered else HttpResponse()
+            response.content = fill_holes(request, content)
+            set_surrogate_keys(response, versions)
+            return response
+        return wrapper
+    return decorator
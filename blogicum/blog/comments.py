@@ -0,0 +1,111 @@
+"""Комментарии в отдельной базе SQLite.
+
+SQLite пускает одного писателя за раз, и поток комментариев блокирует
+файл, из которого читаются посты и ленты. С COMMENTS_DATABASE =
+'comments' модели из COMMENTS_MODELS (комментарии и будущие счётчики
+по постам) читаются и пишутся в свою базу через CommentRouter. Таблица
+создаётся командой migrate --database=comments.
+
+JOIN между базами невозможен, поэтому вместо Count('comments') и
+post.comments код блога пользуется функциями модуля: они работают
+одинаково при общей и при отдельной базе. Каскадное удаление
+комментариев вместе с постом или автором во второй базе делают
+сигналы (см. blog.signals).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+
+from .models import Comment
+
+User = get_user_model()
+
+COMMENTS_ALIAS = 'comments'
+# Таблицы, которые есть и в базе комментариев: отметки изменений и
+# журнал шины для изменений комментариев (см. blog.stamps, blog.bus).
+JOURNAL_MODELS = ('blog.VersionStamp', 'blog.InvalidationEvent')
+
+
+def is_separate():
+    return settings.COMMENTS_DATABASE != DEFAULT_DB_ALIAS
+
+
+class CommentRouter:
+
+    def _routed(self, model):
+        return (is_separate()
+                and model._meta.label in settings.COMMENTS_MODELS)
+
+    def db_for_read(self, model, **hints):
+        if self._routed(model):
+            return settings.COMMENTS_DATABASE
+        instance = hints.get('instance')
+        if (instance is not None and is_separate()
+                and instance._state.db == settings.COMMENTS_DATABASE):
+            # comment.post и comment.author — из основной базы, а не из
+            # базы комментария, как сделал бы Django по умолчанию.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        labels = {obj1._meta.label, obj2._meta.label}
+        if labels & set(settings.COMMENTS_MODELS):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != COMMENTS_ALIAS:
+            return None
+        if model_name is None:
+            return False
+        return f'{app_label}.{model_name}'.lower() in {
+            label.lower()
+            for label in (*settings.COMMENTS_MODELS, *JOURNAL_MODELS)
+        }
+
+
+def card_counts(queryset):
+    """Добавляет comment_count к queryset, если комментарии в той же базе."""
+    if is_separate():
+        return queryset
+    return queryset.annotate(comment_count=Count('comments'))
+
+
+def attach_counts(posts):
+    """Подставляет comment_count постам, у которых его ещё нет."""
+    posts = [post for post in posts
+             if not hasattr(post, 'comment_count')]
+    if not posts:
+        return
+    counts = dict(
+        Comment.objects.filter(post_id__in=[post.pk for post in posts])
+        .order_by().values('post_id').annotate(count=Count('pk'))
+        .values_list('post_id', 'count')
+    )
+    for post in posts:
+        post.comment_count = counts.get(post.pk, 0)
+
+
+def for_post(post):
+    """Комментарии поста от старых к новым, с авторами."""
+    comments = list(Comment.objects.filter(post_id=post.pk)
+                    .order_by('created_at'))
+    authors = User.objects.in_bulk(
+        {comment.author_id for comment in comments}
+    )
+    # Без автора комментарий мог остаться, пока сигнал его не удалил.
+    comments = [comment for comment in comments
+                if comment.author_id in authors]
+    for comment in comments:
+        comment.author = authors[comment.author_id]
+        comment.post = post
+    return comments
+
+
+def delete_for(**lookup):
+    """Удаляет комментарии удалённого поста или автора во второй базе."""
+    if is_separate():
+        Comment.objects.filter(**lookup).delete()
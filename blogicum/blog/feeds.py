@@ -0,0 +1,101 @@
+"""Ленты постов как кешированные списки id и карточки постов.
+
+Лента (главная, категория, автор) хранится в кеше списком пар
+(время публикации, id) по убыванию даты, включая отложенные посты:
+их отсекает чтение, так что пост появляется в ленте вовремя без
+пересчёта списка. Страница — срез списка; посты среза берутся из
+кеша карточек одним get_many, промахи догружаются одним in_bulk().
+
+Карточка хранит версии своих тегов (см. blog.cache.purge): изменение
+поста, его категории, места или автора делает недействительной только
+её. purge() по ключу ленты удаляет только эту ленту.
+
+Запрос, закреплённый за основной базой (blog.replicas.is_pinned), не
+читает кешированные ленты и карточки, а собранное из отстающей реплики
+(replicas.storable) в кеш не пишется.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import comments, lookups, replicas
+from .cache import (
+    SITE_TAG, current_tag_versions, feed_cache_key, get_or_compute,
+    post_cache_tags, tag_versions, tags_current,
+)
+from .models import Post
+
+
+class _FromLaggingReplica(Exception):
+
+    def __init__(self, entries):
+        super().__init__()
+        self.entries = entries
+
+
+def card_cache_key(pk):
+    return f'card:{pk}'
+
+
+def visible_ids(feed_key, queryset):
+    """Список id опубликованных на данный момент постов, новые первыми.
+
+    queryset — посты ленты без фильтра по дате публикации.
+    """
+    def load():
+        return [
+            (pub_date.timestamp(), pk) for pk, pub_date in
+            queryset.order_by('-pub_date').values_list('pk', 'pub_date')
+        ]
+
+    def load_shared():
+        entries = load()
+        if not replicas.storable(tag_versions([feed_key])):
+            raise _FromLaggingReplica(entries)
+        return entries
+
+    if replicas.is_pinned():
+        entries = load()
+    else:
+        try:
+            entries = get_or_compute(
+                feed_cache_key(feed_key), load_shared,
+                settings.FEED_CACHE_TIMEOUT, background=False,
+            )
+        except _FromLaggingReplica as error:
+            entries = error.entries
+    now = timezone.now().timestamp()
+    return [pk for published, pk in entries if published <= now]
+
+
+def card_queryset():
+    return comments.card_counts(Post.objects.select_related('author'))
+
+
+def hydrate(ids):
+    """Посты по списку id в том же порядке; удалённые пропускаются."""
+    keys = {card_cache_key(pk): pk for pk in ids}
+    cards = {} if replicas.is_pinned() else cache.get_many(list(keys))
+    current = current_tag_versions(
+        tag for _, versions in cards.values() for tag in versions
+    )
+    posts = {
+        keys[key]: post for key, (post, versions) in cards.items()
+        if tags_current(versions, current)
+    }
+    missing = [pk for pk in ids if pk not in posts]
+    if missing:
+        loaded = card_queryset().in_bulk(missing)
+        lookups.attach(loaded.values())
+        comments.attach_counts(loaded.values())
+        tags = {pk: {SITE_TAG, *post_cache_tags(post)}
+                for pk, post in loaded.items()}
+        versions = tag_versions(set().union(*tags.values()))
+        versions = {pk: {tag: versions[tag] for tag in tags[pk]}
+                    for pk in loaded}
+        cache.set_many({
+            card_cache_key(pk): (post, versions[pk])
+            for pk, post in loaded.items() if replicas.storable(versions[pk])
+        }, settings.FEED_CACHE_TIMEOUT)
+        posts.update(loaded)
+    return [posts[pk] for pk in ids if pk in posts]
@@ -1,7 +1,53 @@
 from django import forms 
-from .models import Post, Comment, Category, Location
+from django.contrib.auth.forms import PasswordResetForm
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIteratorValue
+from django.template.loader import render_to_string
 from django.utils import timezone
 
+from . import lookups, tasks
+from .models import Post, Comment
+
+
+class LookupChoiceField(forms.ModelChoiceField):
+    """Выбор опубликованного объекта из таблицы в памяти (blog.lookups).
+
+    Ни построение списка, ни проверка значения не обращаются к базе.
+    """
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        super().__init__(table.model._default_manager.none(), **kwargs)
+
+    def _get_choices(self):
+        choices = [('', self.empty_label)] if self.empty_label else []
+        choices.extend(self.table.memoize('published_choices', lambda: [
+            (ModelChoiceIteratorValue(obj.pk, obj),
+             self.label_from_instance(obj))
+            for obj in self.table.published()
+        ]))
+        return choices
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.table.model):
+            value = value.pk
+        try:
+            obj = self.table.get(pk=int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None or not obj.is_published:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
+
+
 class PostForm(forms.ModelForm):
 
     class Meta:
@@ -42,12 +88,14 @@ class PostForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Фильтрация
-        self.fields['category'].queryset = Category.objects.filter(
-            is_published=True
-        )
-        self.fields['location'].queryset = Location.objects.filter(
-            is_published=True
-        )
+        for name, table in (('category', lookups.categories),
+                            ('location', lookups.locations)):
+            field = self.fields[name]
+            self.fields[name] = LookupChoiceField(
+                table, required=field.required, label=field.label,
+                help_text=field.help_text, widget=field.widget,
+                empty_label=field.empty_label,
+            )
         
         # ТОЛЬКО установка начального значения
         # Не пытаемся исправлять логику здесь
@@ -82,4 +130,23 @@ class CommentForm(forms.ModelForm):
         }
         labels = {
             'text': ''
-        }
\ No newline at end of file
+        }
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо для сброса пароля отправляет фоновая очередь (blog.tasks)."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = ''.join(
+            render_to_string(subject_template_name, context).splitlines()
+        )
+        html = None
+        if html_email_template_name is not None:
+            html = render_to_string(html_email_template_name, context)
+        tasks.enqueue(
+            'send_email', priority=10, subject=subject,
+            body=render_to_string(email_template_name, context),
+            from_email=from_email, to=[to_email], html=html,
+        )
@@ -0,0 +1,109 @@
+"""Таблицы категорий и мест в памяти воркера.
+
+Таблицы маленькие и меняются редко, поэтому каждый процесс держит их
+целиком, с индексами по pk и slug, и перечитывает одним запросом
+после любой записи в таблицу. О записи сообщает шина инвалидации:
+blog.querycache публикует тег table:<имя> на каждый INSERT/UPDATE/
+DELETE, в том числе из queryset.update() и из соседних воркеров.
+
+Объекты общие для всех запросов процесса — их нельзя изменять.
+"""
+import threading
+
+from django.db import router
+
+from . import bus
+from .models import Category, Location
+from .querycache import table_tag
+
+
+class LookupTable:
+
+    def __init__(self, model, fields=('pk',)):
+        self.model = model
+        self.fields = fields
+        self.tag = table_tag(model._meta.db_table)
+        self._indexes = None
+        self._generation = 0
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        indexes = {field: {} for field in self.fields}
+        # Из основной базы: реплика может ещё не знать о записи.
+        manager = self.model._default_manager.db_manager(
+            router.db_for_write(self.model)
+        )
+        for obj in manager.order_by('pk'):
+            for field, index in indexes.items():
+                index[getattr(obj, field)] = obj
+        return indexes
+
+    @property
+    def indexes(self):
+        indexes = self._indexes
+        if indexes is None:
+            with self._lock:
+                indexes = self._indexes
+                if indexes is None:
+                    generation = self._generation
+                    indexes = self._load()
+                    # Запись во время чтения: перечитаем в следующий раз.
+                    if generation == self._generation:
+                        self._indexes = indexes
+        return indexes
+
+    def get(self, **lookup):
+        """Объект по одному индексированному полю или None."""
+        (field, value), = lookup.items()
+        return self.indexes[field].get(value)
+
+    def all(self):
+        return list(self.indexes['pk'].values())
+
+    def published(self):
+        return [obj for obj in self.all() if obj.is_published]
+
+    @property
+    def version(self):
+        return self._generation
+
+    def memoize(self, name, build):
+        """Значение build(), пересчитываемое только после записи в таблицу.
+
+        Для производных от таблицы данных, например списков выбора форм.
+        """
+        version, value = self._memo.get(name, (None, None))
+        if version != self._generation:
+            version = self._generation
+            value = build()
+            self._memo[name] = (version, value)
+        return value
+
+    def invalidate(self):
+        self._generation += 1
+        self._indexes = None
+
+    def changed(self, keys):
+        """Подписчик шины."""
+        if self.tag in keys or bus.ALL in keys:
+            self.invalidate()
+
+
+categories = LookupTable(Category, fields=('pk', 'slug'))
+locations = LookupTable(Location)
+
+for table in (categories, locations):
+    bus.subscribe(table.changed)
+
+
+def attach(posts):
+    """Подставляет постам категорию и место из таблиц без запросов."""
+    for post in posts:
+        category = categories.get(pk=post.category_id)
+        if category is not None:
+            post.category = category
+        location = locations.get(pk=post.location_id)
+        if location is not None:
+            post.location = location
+    return posts
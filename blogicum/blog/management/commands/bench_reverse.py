@@ -0,0 +1,69 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from blogicum import reversal
+
+# Вызовы, которые делают карточки постов, комментарии и шапка.
+HOT_CALLS = (
+    ('blog:index', (), {}),
+    ('blog:post_detail', (), {'pk': 42}),
+    ('blog:category_posts', ('travel',), {}),
+    ('blog:edit_comment', (42, 7), {}),
+    ('profile', ('username',), {}),
+    ('pages:about', (), {}),
+    ('login', (), {}),
+)
+
+
+def measure(function, number, repeat):
+    """Лучшее время одного прохода по HOT_CALLS в микросекундах."""
+    def run():
+        for name, args, kwargs in HOT_CALLS:
+            function(name, args=args, kwargs=kwargs)
+
+    best = min(timeit.repeat(run, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость blogicum.reversal.reverse() и '
+        'django.urls.reverse() на типичных для страниц маршрутах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number', type=int, default=2000,
+            help='Проходов по списку маршрутов в одном замере.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Число замеров; берётся лучший.'
+        )
+
+    def handle(self, *args, **options):
+        for name, call_args, call_kwargs in HOT_CALLS:
+            expected = reverse(name, args=call_args, kwargs=call_kwargs)
+            actual = reversal.reverse(name, call_args, call_kwargs)
+            if actual != expected:
+                self.stderr.write(
+                    f'{name}: {actual!r} != {expected!r}'
+                )
+        reversal.get_routes()
+        results = {
+            'django.urls.reverse': measure(
+                reverse, options['number'], options['repeat']
+            ),
+            'blogicum.reversal.reverse': measure(
+                reversal.reverse, options['number'], options['repeat']
+            ),
+        }
+        calls = len(HOT_CALLS)
+        for label, per_pass in results.items():
+            self.stdout.write(
+                f'{label:28} {per_pass / calls:8.2f} мкс/вызов'
+            )
+        baseline, fast = results.values()
+        self.stdout.write(f'Ускорение: {baseline / fast:.1f}x')
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blogicum.sqlite import apply_pragmas
+
+# Без PRAGMA: как соединение Django по умолчанию (журнал отката,
+# ожидание блокировки — таймаут модуля sqlite3).
+PROFILES = {
+    'default': {},
+    'tuned': settings.SQLITE_PRAGMAS,
+}
+
+
+def prepare(path, rows):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT, text TEXT)'
+    )
+    connection.executemany(
+        'INSERT INTO post (title, text) VALUES (?, ?)',
+        ((f'Пост {n}', 'текст ' * 50) for n in range(rows)),
+    )
+    connection.commit()
+    connection.close()
+
+
+class Worker(threading.Thread):
+
+    def __init__(self, path, pragmas, write, deadline, rows):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.write = write
+        self.deadline = deadline
+        self.rows = rows
+        self.done = 0
+        self.locked = 0
+        self.latencies = []
+
+    def run(self):
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        apply_pragmas(connection.cursor(), self.pragmas)
+        n = 0
+        while time.monotonic() < self.deadline:
+            n += 1
+            started = time.perf_counter()
+            try:
+                if self.write:
+                    connection.execute(
+                        'UPDATE post SET text = ? WHERE id = ?',
+                        (f'правка {n}', n % self.rows + 1),
+                    )
+                else:
+                    connection.execute(
+                        'SELECT id, title, text FROM post '
+                        'ORDER BY id DESC LIMIT 10 OFFSET ?',
+                        (n % (self.rows // 10) * 10,),
+                    ).fetchall()
+            except sqlite3.OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                self.locked += 1
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            self.done += 1
+        connection.close()
+
+
+def run_profile(pragmas, readers, writers, duration, rows):
+    """Операций в секунду, ошибок блокировки и p95 для одного профиля."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        prepare(path, rows)
+        deadline = time.monotonic() + duration
+        workers = (
+            [Worker(path, pragmas, False, deadline, rows)
+             for _ in range(readers)]
+            + [Worker(path, pragmas, True, deadline, rows)
+               for _ in range(writers)]
+        )
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    result = {}
+    for kind, write in (('reads', False), ('writes', True)):
+        group = [worker for worker in workers if worker.write == write]
+        latencies = sorted(
+            latency for worker in group for latency in worker.latencies
+        )
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        result[kind] = {
+            'per_second': sum(worker.done for worker in group) / duration,
+            'locked': sum(worker.locked for worker in group),
+            'p95_ms': p95 * 1000,
+        }
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite без настроек и с SQLITE_PRAGMAS при '
+        'одновременных чтениях и записях из нескольких потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на профиль.'
+        )
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Строк в тестовой таблице, не меньше 10.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rows'] < 10:
+            # Читатели выбирают строки шагом rows // 10.
+            raise CommandError('--rows должно быть не меньше 10.')
+        for name, pragmas in PROFILES.items():
+            result = run_profile(
+                pragmas, options['readers'], options['writers'],
+                options['duration'], options['rows'],
+            )
+            for kind, stats in result.items():
+                self.stdout.write(
+                    f'{name:8} {kind:6} {stats["per_second"]:10.0f} оп/с  '
+                    f'p95 {stats["p95_ms"]:7.2f} мс  '
+                    f'locked {stats["locked"]}'
+                )
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class _Restarted(Exception):
+    pass
+
+
+def backup(source, path, pages, sleep, max_restarts, fallback=True):
+    """Копирует базу в path шагами по pages страниц с паузами.
+
+    Запись в базу другим соединением перезапускает копирование с первой
+    страницы. Перезапусков не больше max_restarts; после них при fallback
+    база копируется заново целиком одним шагом, иначе — CommandError.
+    Один шаг держит снимок чтения на всё время копии: писателей он не
+    блокирует, но WAL не сбрасывается в базу и растёт, пока копия не
+    закончится. Копия пишется во временный файл и появляется под именем
+    path целиком. Возвращает число перезапусков.
+    """
+    partial = f'{path}.part'
+    target = sqlite3.connect(partial)
+    try:
+        restarts = _copy(source, target, pages, sleep, max_restarts,
+                         fallback)
+        row = target.execute('PRAGMA quick_check').fetchone()
+        if row[0] != 'ok':
+            raise CommandError(f'Копия повреждена: {row[0]}')
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    target.close()
+    os.replace(partial, path)
+    return restarts
+
+
+def _copy(source, target, pages, sleep, max_restarts, fallback):
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining >= state['remaining']:
+            state['restarts'] += 1
+        state['remaining'] = remaining
+        if state['restarts'] >= max_restarts:
+            raise _Restarted
+        if remaining:
+            # sleep у backup() — только пауза при занятой базе.
+            time.sleep(sleep)
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except _Restarted:
+        if not fallback:
+            raise CommandError(
+                f'Копирование перезапускалось {max_restarts} раз: '
+                'база меняется слишком часто.'
+            )
+        source.backup(target)
+    return state['restarts']
+
+
+def analyze(connection, limit):
+    """Обновляет статистику планировщика; limit — строк на индекс."""
+    connection.execute(f'PRAGMA analysis_limit = {int(limit)}')
+    connection.execute('ANALYZE')
+
+
+def incremental_vacuum(connection, step, budget, seconds, sleep):
+    """Возвращает свободные страницы файлу, пока не кончится бюджет.
+
+    Каждый шаг — отдельная короткая транзакция на step страниц; между
+    шагами пауза, чтобы успели писатели. Возвращает число страниц.
+    """
+    if connection.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return None
+    deadline = time.monotonic() + seconds
+    freed = 0
+    while freed < budget and time.monotonic() < deadline:
+        free = connection.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        pages = min(step, free, budget - freed)
+        # execute() освободил бы одну страницу: прагма отдаёт по
+        # странице на шаг, а строк не возвращает.
+        connection.executescript(f'PRAGMA incremental_vacuum({pages});')
+        freed += pages
+        time.sleep(sleep)
+    return freed
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание SQLite без остановки сайта: резервная копия через '
+        'backup API, ANALYZE и incremental vacuum в пределах бюджета. '
+        'Подходит для запуска из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--backup', metavar='PATH',
+            help='Файл копии; допускает шаблон strftime, например '
+                 'backups/db-%%Y%%m%%d-%%H%%M.sqlite3.'
+        )
+        parser.add_argument(
+            '--pages', type=int, default=256,
+            help='Страниц за шаг копирования.'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.05,
+            help='Пауза между шагами копирования и vacuum, секунд.'
+        )
+        parser.add_argument(
+            '--max-restarts', type=int, default=5,
+            help='Перезапусков копирования до перехода на один шаг.'
+        )
+        parser.add_argument(
+            '--no-fallback', action='store_false', dest='fallback',
+            help='После --max-restarts перезапусков не копировать базу '
+                 'одним шагом, а завершиться с ошибкой.'
+        )
+        parser.add_argument('--analyze', action='store_true')
+        parser.add_argument(
+            '--analysis-limit', type=int, default=1000,
+            help='Строк индекса, которые читает ANALYZE.'
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='Бюджет incremental vacuum в страницах; 0 — не чистить.'
+        )
+        parser.add_argument('--vacuum-step', type=int, default=100)
+        parser.add_argument(
+            '--vacuum-seconds', type=float, default=10,
+            help='Бюджет incremental vacuum по времени.'
+        )
+
+    def handle(self, *args, **options):
+        wrapper = connections[options['database']]
+        if wrapper.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+
+        if options['backup']:
+            path = datetime.now().strftime(options['backup'])
+            started = time.monotonic()
+            restarts = backup(
+                connection, path, options['pages'], options['sleep'],
+                options['max_restarts'], options['fallback'],
+            )
+            self.stdout.write(
+                f'Копия {path}: {time.monotonic() - started:.1f} с, '
+                f'перезапусков {restarts}.'
+            )
+
+        if options['analyze']:
+            analyze(connection, options['analysis_limit'])
+            self.stdout.write('ANALYZE выполнен.')
+
+        if options['vacuum_pages']:
+            freed = incremental_vacuum(
+                connection, options['vacuum_step'], options['vacuum_pages'],
+                options['vacuum_seconds'], options['sleep'],
+            )
+            if freed is None:
+                self.stderr.write(
+                    'auto_vacuum не INCREMENTAL: включите его и выполните '
+                    'VACUUM в окно обслуживания.'
+                )
+            else:
+                self.stdout.write(f'Освобождено страниц: {freed}.')
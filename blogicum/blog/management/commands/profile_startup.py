@@ -0,0 +1,131 @@
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PREFIXES = ('blog', 'pages', 'blogicum', 'django_bootstrap5',
+                    'django.contrib')
+
+SETUP_CODE = 'import django; django.setup()'
+URLCONF_CODE = (
+    '; from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def parse_importtime(output):
+    """Разбирает вывод `python -X importtime` в {модуль: (self, cumul)}."""
+    result = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        try:
+            result[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            # Строка заголовка: «self [us] | cumulative | imported package».
+            continue
+    return result
+
+
+def matches(module, prefixes):
+    return any(module == prefix or module.startswith(prefix + '.')
+               for prefix in prefixes)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время импорта модулей при django.setup() и выводит '
+        'самые медленные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Сколько модулей показать.'
+        )
+        parser.add_argument(
+            '--runs', type=int, default=3,
+            help='Число холодных запусков; берётся медиана.'
+        )
+        parser.add_argument(
+            '--prefix', action='append', dest='prefixes',
+            help='Учитывать только модули с этим префиксом '
+                 '(можно указать несколько раз).'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Не фильтровать модули по префиксам.'
+        )
+        parser.add_argument(
+            '--urls', action='store_true',
+            help='Дополнительно импортировать ROOT_URLCONF и все view.'
+        )
+        parser.add_argument(
+            '--sort', choices=('self', 'cumulative'), default='cumulative'
+        )
+
+    def measure(self, code):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr.strip().splitlines()[-1])
+        return parse_importtime(process.stderr)
+
+    def handle(self, *args, **options):
+        code = SETUP_CODE + (URLCONF_CODE if options['urls'] else '')
+        samples = defaultdict(list)
+        totals = []
+        for _ in range(max(options['runs'], 1)):
+            timings = self.measure(code)
+            totals.append(sum(self_us for self_us, _ in timings.values()))
+            for module, timing in timings.items():
+                samples[module].append(timing)
+
+        median = {
+            module: (
+                statistics.median(t[0] for t in values),
+                statistics.median(t[1] for t in values),
+            )
+            for module, values in samples.items()
+        }
+        prefixes = options['prefixes'] or DEFAULT_PREFIXES
+        if not options['all']:
+            median = {module: timing for module, timing in median.items()
+                      if matches(module, prefixes)}
+
+        index = 0 if options['sort'] == 'self' else 1
+        worst = sorted(median.items(), key=lambda item: item[1][index],
+                       reverse=True)[:options['limit']]
+
+        self.stdout.write(
+            f'Всего на импорт: {statistics.median(totals) / 1000:.1f} мс '
+            f'(медиана из {len(totals)} запусков)'
+        )
+        self.stdout.write(f'{"self, мс":>10} {"cumul, мс":>10}  модуль')
+        for module, (self_us, cumulative_us) in worst:
+            self.stdout.write(
+                f'{self_us / 1000:10.2f} {cumulative_us / 1000:10.2f}  '
+                f'{module}'
+            )
+
+        groups = defaultdict(float)
+        for module, (self_us, _) in median.items():
+            group = next((prefix for prefix in prefixes
+                          if matches(module, [prefix])), module.split('.')[0])
+            groups[group] += self_us
+        self.stdout.write('\nПо группам (сумма self):')
+        for group, self_us in sorted(groups.items(),
+                                     key=lambda item: -item[1]):
+            self.stdout.write(f'{self_us / 1000:10.2f}  {group}')
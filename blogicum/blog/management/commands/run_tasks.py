@@ -0,0 +1,82 @@
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from blog import tasks
+
+
+def _run(task):
+    try:
+        tasks.run(task)
+    finally:
+        # Соединения с БД в потоке свои, закрываем их сами.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи фоновой очереди (blog.tasks) в пуле потоков. '
+        'SIGTERM и Ctrl+C дожидаются начатых задач.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=settings.TASK_WORKERS,
+            help='Сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASK_POLL_INTERVAL,
+            help='Пауза в секундах, когда готовых задач нет.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        if threads < 1:
+            raise CommandError('--threads должно быть не меньше 1.')
+        stop = threading.Event()
+        previous = {
+            signum: signal.signal(signum, lambda *args: stop.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            done = self.work(stop, threads, options)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f'Обработано задач: {done}')
+
+    def work(self, stop, threads, options):
+        worker = tasks.worker_name()
+        released_at = None
+        running = set()
+        done = 0
+        with ThreadPoolExecutor(threads) as pool:
+            while not stop.is_set():
+                now = time.monotonic()
+                if (released_at is None
+                        or now - released_at > settings.TASK_LOCK_TIMEOUT):
+                    tasks.release_stale()
+                    released_at = now
+                finished = {future for future in running if future.done()}
+                done += len(finished)
+                running -= finished
+                free = threads - len(running)
+                claimed = tasks.claim(worker, free) if free else []
+                for task in claimed:
+                    running.add(pool.submit(_run, task))
+                if claimed:
+                    continue
+                if options['once'] and not running:
+                    break
+                stop.wait(options['poll_interval'])
+        return done + len(running)
@@ -0,0 +1,87 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import get_internal_wsgi_application
+
+from blogicum import warmup
+from blogicum.prefork import PreforkServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает prefork-сервер: приложение и шаблоны загружаются '
+        'до fork(), воркеры перезапускаются по потолку памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 2,
+            help='Количество воркеров.'
+        )
+        parser.add_argument(
+            '--max-memory', type=int, default=256,
+            help='Потолок RSS воркера в МБ; 0 — без ограничения.'
+        )
+        parser.add_argument(
+            '--max-requests', type=int, default=0,
+            help='Перезапуск воркера после N запросов; 0 — без ограничения.'
+        )
+        parser.add_argument('--backlog', type=int, default=128)
+        parser.add_argument(
+            '--task-threads', type=int, default=settings.TASK_WORKERS,
+            help='Потоков обработчика очереди задач (run_tasks) рядом с '
+                 'воркерами; 0 — обработчик запущен отдельно.'
+        )
+        parser.add_argument(
+            '--no-access-log', action='store_false', dest='access_log'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должно быть не меньше 1.')
+        if options['task_threads'] < 0:
+            raise CommandError('--task-threads не может быть меньше 0.')
+
+        application = get_internal_wsgi_application()
+        stats = warmup.warm_up()
+        self.stdout.write(
+            f'Скомпилировано шаблонов: {stats["templates"]}'
+            f' (с ошибками: {stats["template_errors"]})'
+        )
+        # База доступна; соединения воркеры откроют сами после fork().
+        warmup.close_connections()
+
+        server = PreforkServer(
+            application,
+            host=options['host'],
+            port=options['port'],
+            workers=options['workers'],
+            max_memory=options['max_memory'] * 1024 * 1024,
+            max_requests=options['max_requests'],
+            backlog=options['backlog'],
+            on_worker_start=warmup.open_connections,
+            access_log=options['access_log'],
+            background=self.task_worker(options['task_threads']),
+        )
+        try:
+            server.bind()
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            f'Сервер запущен на http://{options["host"]}:{options["port"]}/'
+            f', воркеров: {options["workers"]}'
+            f', потоков очереди задач: {options["task_threads"]}'
+        )
+        server.run()
+
+    @staticmethod
+    def task_worker(threads):
+        # Без обработчика письма для сброса пароля и удаление
+        # комментариев удалённых постов так и останутся в очереди.
+        if not threads:
+            return None
+        return lambda: call_command('run_tasks', threads=threads)
@@ -0,0 +1,259 @@
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.cache import has_vary_header, patch_cache_control
+
+from blogicum import health, metrics, prefork, querybudget, reversal
+
+from . import breaker, bus, replicas
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class HealthCheckMiddleware:
+    """Пробы балансировщика (blogicum.health) в обход остальной цепочки.
+
+    Должен стоять первым: пробы не проходят через сессии, пользователей
+    и сброс нагрузки.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.probes = {
+            settings.HEALTH_LIVE_PATH: health.live,
+            settings.HEALTH_READY_PATH: health.ready,
+        }
+
+    def __call__(self, request):
+        probe = self.probes.get(request.path_info)
+        if probe is None:
+            return self.get_response(request)
+        return probe()
+
+
+class AnonymousReadMiddleware:
+    """Быстрый путь для анонимных GET/HEAD-запросов.
+
+    Если у запроса нет cookie сессии, пользователь заведомо анонимный:
+    подставляем AnonymousUser сразу, и ни AuthenticationMiddleware, ни
+    шаблоны не трогают сессию, поэтому SessionMiddleware не добавляет
+    `Vary: Cookie`. Ответ, не зависящий от cookie, помечается как
+    публичный и может кешироваться общим прокси. Прокси должен
+    пропускать мимо кеша запросы с cookie сессии.
+
+    Должен стоять после AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_age = settings.ANONYMOUS_CACHE_MAX_AGE
+
+    def __call__(self, request):
+        anonymous_read = (
+            request.method in SAFE_METHODS
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        )
+        if anonymous_read:
+            request.user = AnonymousUser()
+            request._cached_user = request.user
+        response = self.get_response(request)
+        if anonymous_read and self.is_shareable(request, response):
+            patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+
+    @staticmethod
+    def is_shareable(request, response):
+        session = getattr(request, 'session', None)
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not response.has_header('Cache-Control')
+            and not has_vary_header(response, 'Cookie')
+            and not (session is not None and session.accessed)
+            # csrf_token в шаблоне: CsrfViewMiddleware поставит cookie.
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
+
+
+class InvalidationBusMiddleware:
+    """Перед запросом дочитывает журнал шины инвалидации.
+
+    Сам опрос ограничен INVALIDATION_POLL_INTERVAL, так что большинство
+    запросов проходит без обращения к базе.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        breaker.call_if_closed(bus.poll)
+        return self.get_response(request)
+
+
+class CircuitBreakerMiddleware:
+    """Режим «только чтение», пока разомкнут автомат blog.breaker.
+
+    Запись при разомкнутом автомате получает вежливый 503; по истечении
+    BREAKER_RESET_TIMEOUT одна запись пропускается на пробу. Ошибки
+    перегрузки базы из любых представлений считаются автоматом.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        write = request.method not in SAFE_METHODS
+        if write and not breaker.allow_request():
+            metrics.incr('breaker.rejected_writes')
+            return breaker.read_only_response()
+        response = self.get_response(request)
+        if (write and response.status_code < 500
+                and not getattr(request, 'db_overloaded', False)):
+            breaker.record_success()
+        return response
+
+    def process_exception(self, request, exception):
+        if not breaker.is_overload(exception):
+            return None
+        request.db_overloaded = True
+        breaker.record_failure()
+        if request.method in SAFE_METHODS:
+            return querybudget.unavailable()
+        return breaker.read_only_response()
+
+
+class ReplicaMiddleware:
+    """Запускает обновление реплик и закрепляет за основной базой пишущих.
+
+    Запрос с записью (не GET/HEAD) целиком читает из основной базы и
+    ставит cookie REPLICA_STICKY_COOKIE на REPLICA_STICKY_SECONDS:
+    пока она есть, из основной базы читаются и следующие запросы
+    сессии — реплика к тому времени догонит основную базу. Чтения
+    запроса с реплик отслеживаются (replicas.track_reads): собранное из
+    отстающей копии не попадает в общий кеш.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        replicas.start()
+        wrote = request.method not in SAFE_METHODS
+        sticky = settings.REPLICA_STICKY_COOKIE in request.COOKIES
+        with replicas.pin_primary(wrote or sticky), replicas.track_reads():
+            response = self.get_response(request)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class LoadSheddingMiddleware:
+    """Отказывает второстепенным запросам, когда воркер перегружен.
+
+    Перегрузка — ожидание в очереди прокси дольше
+    LOAD_SHEDDING_MAX_QUEUE_TIME секунд или слишком много запросов,
+    ждущих воркера:
+
+    - под serve.py (blogicum.prefork) воркеры однопоточные, и ждущие
+      соединения стоят в общей очереди слушающего сокета: перегрузка —
+      больше LOAD_SHEDDING_MAX_BACKLOG соединений в ней;
+    - в многопоточном сервере (runserver, gunicorn --threads) —
+      больше LOAD_SHEDDING_MAX_IN_FLIGHT одновременных запросов в
+      процессе.
+
+    Время ожидания считается от заголовка X-Request-Start (nginx:
+    `proxy_set_header X-Request-Start "t=${msec}";` — заменяет
+    присланный клиентом). Заголовок принимается только от адресов из
+    LOAD_SHEDDING_TRUSTED_PROXIES: иначе клиент мог бы подделать время.
+
+    Второстепенные запросы — анонимные страницы ленты дальше
+    LOAD_SHEDDING_DEEP_PAGE и списки объектов в админке. Им отвечает
+    готовый 503 с Retry-After, без сессии, шаблонов и базы. Запись от
+    вошедшего пользователя пропускается всегда.
+
+    Стоит сразу после HealthCheckMiddleware: пробы балансировщика не
+    отбрасываются никогда.
+    """
+
+    CHANGELIST_RE = re.compile(r'[^/]+/[^/]+/$')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        with self.lock:
+            self.in_flight += 1
+            in_flight = self.in_flight
+        try:
+            reason = self.overload(request, in_flight)
+            if reason and self.is_low_priority(request):
+                metrics.incr('loadshed.rejected')
+                metrics.incr(f'loadshed.rejected.{reason}')
+                return querybudget.unavailable(
+                    settings.LOAD_SHEDDING_RETRY_AFTER
+                )
+            return self.get_response(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def overload(request, in_flight):
+        """Причина перегрузки или None."""
+        backlog = request.META.get(prefork.BACKLOG_ENVIRON_KEY)
+        waiting = backlog() if backlog is not None else None
+        if waiting is not None:
+            # Воркер prefork-сервера однопоточный: ждут не в нём, а в
+            # очереди общего сокета.
+            if waiting > settings.LOAD_SHEDDING_MAX_BACKLOG:
+                return 'backlog'
+        elif in_flight > settings.LOAD_SHEDDING_MAX_IN_FLIGHT:
+            return 'in_flight'
+        queue_time = request_queue_time(request)
+        if (queue_time is not None
+                and queue_time > settings.LOAD_SHEDDING_MAX_QUEUE_TIME):
+            return 'queue_time'
+        return None
+
+    def is_low_priority(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        admin = reversal.reverse('admin:index')
+        if request.path.startswith(admin):
+            return bool(self.CHANGELIST_RE.fullmatch(
+                request.path[len(admin):]
+            ))
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        page = request.GET.get('page', '')
+        return (page.isdigit()
+                and int(page) > settings.LOAD_SHEDDING_DEEP_PAGE)
+
+
+def request_queue_time(request):
+    """Секунды с момента, когда запрос принял прокси, или None."""
+    if (request.META.get('REMOTE_ADDR')
+            not in settings.LOAD_SHEDDING_TRUSTED_PROXIES):
+        return None
+    header = request.META.get('HTTP_X_REQUEST_START', '')
+    value = header[2:] if header.startswith('t=') else header
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # Прокси пишут секунды, миллисекунды или микросекунды.
+    while started > 1e11:
+        started /= 1000
+    return max(time.time() - started, 0.0)
@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def create_site_stamp(apps, schema_editor):
+    # Общая отметка нужна для Last-Modified любой страницы; при чтении
+    # она больше не создаётся.
+    VersionStamp = apps.get_model('blog', 'VersionStamp')
+    VersionStamp.objects.using(schema_editor.connection.alias).get_or_create(
+        key='site', defaults={'updated_at': timezone.now()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_site_stamp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, router
+
+
+def create_journal_tables(apps, schema_editor):
+    # В базе комментариев миграции 0005 и 0006 могли быть отмечены
+    # применёнными без таблиц: тогда роутер их туда не пускал.
+    connection = schema_editor.connection
+    tables = connection.introspection.table_names()
+    for name in ('VersionStamp', 'InvalidationEvent'):
+        model = apps.get_model('blog', name)
+        if (model._meta.db_table not in tables
+                and router.allow_migrate_model(connection.alias, model)):
+            schema_editor.create_model(model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_site_stamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_journal_tables, migrations.RunPython.noop,
+            hints={'model_name': 'versionstamp'},
+        ),
+    ]
@@ -0,0 +1,90 @@
+"""Отрицательный кеш для несуществующих постов и пользователей.
+
+Сканеры перебирают /posts/<id>/ и /profile/<имя>/. Если строки в базе
+нет, декоратор guard запоминает это в кеше на MISSING_CACHE_TIMEOUT
+секунд, и следующие такие запросы получают NotFound до обращения к
+базе и до остальных декораторов страницы. Страницу NotFound
+page_not_found отдаёт заранее отрендеренной (pages.views).
+
+Запись сбрасывает forget() из сигналов при создании объекта, а копии
+в L1 других воркеров — шина: создание поста публикует тег
+post:<id>, пользователя — author:<имя>, и у отрицательного кеша те же
+виды ключей. Скрытый (неопубликованный) пост существует и не
+запоминается.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.http import Http404
+
+from blogicum import metrics
+
+from . import bus
+
+
+class NotFound(Http404):
+    """Объекта нет в базе: страница 404 отдаётся готовой."""
+
+
+def cache_key(kind, value):
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return f'missing:{kind}:{digest}'
+
+
+def is_missing(kind, value):
+    return cache.get(cache_key(kind, value)) is not None
+
+
+def remember(kind, value):
+    cache.set(cache_key(kind, value), True, settings.MISSING_CACHE_TIMEOUT)
+    metrics.incr(f'missing.stored.{kind}')
+
+
+def forget(kind, value):
+    cache.delete(cache_key(kind, value))
+
+
+def _exists(model, field, value):
+    # Из основной базы: реплика может ещё не знать о новой строке.
+    manager = model._default_manager.db_manager(router.db_for_write(model))
+    return manager.filter(**{field: value}).exists()
+
+
+def guard(kind, model, field):
+    """Декоратор view с аргументом field, ищущей объект model.
+
+    Http404 из view при отсутствии строки запоминается; если строка
+    есть (объект скрыт от пользователя), ошибка проходит как есть.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            value = kwargs[field]
+            if is_missing(kind, value):
+                metrics.incr(f'missing.hit.{kind}')
+                raise NotFound
+            try:
+                return view(request, *args, **kwargs)
+            except Http404 as error:
+                if (isinstance(error, NotFound)
+                        or _exists(model, field, value)):
+                    raise
+                remember(kind, value)
+                raise NotFound from error
+        return wrapper
+    return decorator
+
+
+@bus.subscribe
+def drop_local_copies(keys):
+    """Подписчик шины: копии в L1 этого воркера для созданных объектов."""
+    if not hasattr(cache, 'drop_local') or bus.ALL in keys:
+        # Всё L1 при ALL сбрасывает blog.cache.drop_local_copies.
+        return
+    for key in keys:
+        kind, _, value = key.partition(':')
+        if value:
+            cache.drop_local(cache_key(kind, value))
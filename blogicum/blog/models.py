@@ -1,8 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
+_comments_deferred = ContextVar('comments_deferred', default=False)
+
+
+@contextmanager
+def defer_comment_cascade():
+    """Удаление постов без каскада на комментарии.
+
+    Комментарии остаются с post_id удалённого поста, их удаляет
+    фоновая задача (blog.tasks.delete_comments).
+    """
+    token = _comments_deferred.set(True)
+    try:
+        yield
+    finally:
+        _comments_deferred.reset(token)
+
+
+def comment_cascade_deferred():
+    return _comments_deferred.get()
+
+
+def cascade_comments(collector, field, sub_objs, using):
+    """on_delete комментариев поста: CASCADE, если каскад не отложен."""
+    if not _comments_deferred.get():
+        models.CASCADE(collector, field, sub_objs, using)
+
 
 class Post(models.Model):
     title = models.CharField(max_length=256, verbose_name='Заголовок')
@@ -101,17 +131,21 @@ class Location(models.Model):
 
 class Comment(models.Model):
     text = models.TextField(verbose_name='Текст комментария')
+    # Без ограничений в базе: комментарии могут жить в отдельной базе
+    # (blog.comments), где таблиц постов и пользователей нет.
     post = models.ForeignKey(
         Post,
-        on_delete=models.CASCADE,
+        on_delete=cascade_comments,
         related_name='comments',
-        verbose_name='Публикация'
+        verbose_name='Публикация',
+        db_constraint=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='comments',
-        verbose_name='Автор комментария'
+        verbose_name='Автор комментария',
+        db_constraint=False,
     )
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -125,3 +159,93 @@ class Comment(models.Model):
 
     def __str__(self):
         return f'Комментарий от {self.author} к посту "{self.post.title[:20]}"'
+
+
+class VersionStamp(models.Model):
+    """Время последнего изменения данных под ключом.
+
+    Ключи: post:<id>, feed:index, category:<slug>, author:<username>,
+    site (изменения, видимые на всех страницах). Используются для
+    ETag/Last-Modified без рендеринга страницы.
+    """
+
+    key = models.CharField(max_length=255, unique=True, verbose_name='Ключ')
+    updated_at = models.DateTimeField(verbose_name='Изменено')
+
+    class Meta:
+        verbose_name = 'отметка изменения'
+        verbose_name_plural = 'Отметки изменений'
+
+    def __str__(self):
+        return self.key
+
+
+class InvalidationEvent(models.Model):
+    """Запись журнала шины инвалидации (см. blog.bus).
+
+    Воркеры читают журнал по возрастанию id, запоминая последний
+    прочитанный, и сбрасывают свои копии данных под ключом.
+    """
+
+    key = models.CharField(max_length=255, verbose_name='Ключ')
+    created_at = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name='Опубликовано'
+    )
+
+    class Meta:
+        verbose_name = 'событие инвалидации'
+        verbose_name_plural = 'События инвалидации'
+
+    def __str__(self):
+        return self.key
+
+
+class Task(models.Model):
+    """Задача фоновой очереди (см. blog.tasks)."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Аргументы')
+    priority = models.SmallIntegerField(
+        default=0, verbose_name='Приоритет',
+        help_text='Задачи с большим приоритетом выполняются раньше.'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Выполнить не раньше'
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED,
+        verbose_name='Состояние'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    locked_by = models.CharField(
+        max_length=100, blank=True, verbose_name='Обработчик'
+    )
+    locked_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Взята в работу'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Добавлено'
+    )
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'],
+                         name='blog_task_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
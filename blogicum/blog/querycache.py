@@ -0,0 +1,150 @@
+"""Кеш результатов запросов ORM с инвалидацией по таблицам.
+
+Включается явно: cached(queryset) возвращает копию queryset, результат
+которой (и всех производных от неё — get(), first(), filter()) берётся
+из кеша по ключу из SQL и параметров запроса. Кешируются только
+запросы, все таблицы которых перечислены в QUERY_CACHE_TABLES:
+маленькие и редко меняющиеся.
+
+Запись в такую таблицу замечает обёртка выполнения запросов
+(connection.execute_wrappers) и сбрасывает версию тега table:<имя>
+через blog.cache.purge(), так что записи, прочитавшие таблицу, больше
+не считаются актуальными — в том числе после queryset.update() и
+сырого SQL, мимо сигналов моделей. Внутри транзакции сброс повторяется
+после коммита: иначе соседний воркер мог бы успеть закешировать
+старые данные под новой версией.
+
+Попадания и промахи считаются по таблицам (querycache.hits.<таблица>,
+querycache.misses.<таблица>), см. stats().
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import transaction
+
+from blogicum import metrics
+
+from .cache import current_tag_versions, purge, tag_versions, tags_current
+
+READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?')
+WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|REPLACE\s+INTO)\s+"?(\w+)"?',
+    re.IGNORECASE,
+)
+
+
+def table_tag(table):
+    return f'table:{table}'
+
+
+class CachedQuerySetMixin:
+    """Берёт результат запроса из кеша; см. cached()."""
+
+    _query_cache_timeout = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._query_cache_timeout = self._query_cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = self._cached_results()
+        super()._fetch_all()
+
+    def _cached_results(self):
+        if self.query.select_for_update:
+            return None
+        try:
+            sql, params = self.query.get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        tables = set(READ_TABLES_RE.findall(sql))
+        if not tables or not tables <= set(settings.QUERY_CACHE_TABLES):
+            return None
+
+        key = 'query:' + hashlib.md5(repr(
+            (self.db, self._iterable_class.__name__, sql, params)
+        ).encode()).hexdigest()
+        entry = cache.get(key)
+        if entry is not None:
+            results, versions = entry
+            if tags_current(versions, current_tag_versions(versions)):
+                _count('hits', tables)
+                return list(results)
+        _count('misses', tables)
+        results = list(self._iterable_class(self))
+        versions = tag_versions(table_tag(table) for table in tables)
+        cache.set(key, (results, versions), self._query_cache_timeout)
+        return results
+
+
+_classes = {}
+
+
+def cached(queryset, timeout=None):
+    """Копия queryset (или менеджера) с кешированием результата."""
+    queryset = queryset.all()
+    cls = queryset.__class__
+    if not issubclass(cls, CachedQuerySetMixin):
+        if cls not in _classes:
+            _classes[cls] = type(
+                f'Cached{cls.__name__}', (CachedQuerySetMixin, cls), {}
+            )
+        cls = _classes[cls]
+    queryset.__class__ = cls
+    queryset._query_cache_timeout = (
+        settings.QUERY_CACHE_TIMEOUT if timeout is None else timeout
+    )
+    return queryset
+
+
+def _count(kind, tables):
+    for table in tables:
+        metrics.incr(f'querycache.{kind}.{table}')
+
+
+def invalidate_tables(*tables):
+    for table in tables:
+        metrics.incr(f'querycache.invalidations.{table}')
+    purge(*(table_tag(table) for table in tables))
+
+
+def track_writes(execute, sql, params, many, context):
+    """Обёртка выполнения запросов: сбрасывает кеш изменённых таблиц."""
+    result = execute(sql, params, many, context)
+    match = WRITE_TABLE_RE.match(sql)
+    if match and match.group(1) in settings.QUERY_CACHE_TABLES:
+        table = match.group(1)
+        invalidate_tables(table)
+        connection = context['connection']
+        if connection.in_atomic_block:
+            transaction.on_commit(
+                lambda: invalidate_tables(table), using=connection.alias
+            )
+    return result
+
+
+def install(connection, **kwargs):
+    """Обработчик connection_created: подключает track_writes."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_writes)
+
+
+def stats():
+    """Попадания, промахи, сбросы и доля попаданий по таблицам."""
+    result = {}
+    for name, value in metrics.snapshot('querycache.').items():
+        _, kind, table = name.split('.', 2)
+        result.setdefault(
+            table, {'hits': 0, 'misses': 0, 'invalidations': 0}
+        )[kind] = value
+    for counters in result.values():
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = (
+            counters['hits'] / lookups if lookups else None
+        )
+    return result
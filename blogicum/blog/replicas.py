@@ -0,0 +1,324 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплика — обычный алиас в DATABASES, перечисленный в
+DATABASE_REPLICAS: файл SQLite или именованная база в памяти
+(file:<имя>?mode=memory&cache=shared). Основная база копируется в неё
+через backup API раз в REPLICA_REFRESH_INTERVAL секунд фоновым потоком
+(start(), запускается из ReplicaMiddleware), а не в запросе.
+
+Файловую реплику обновляет один процесс на всех: поток, захвативший
+файловую блокировку <файл>.lock, копирует базу, если по общей отметке
+<файл>.sync копия устарела. Реплика в памяти у каждого процесса своя,
+и обновляет её он сам. Реплика без копии или с копией старше
+REPLICA_MAX_LAG секунд (обновляющий процесс мог остановиться) не
+используется.
+
+ReplicaRouter отправляет на реплики только чтение моделей из
+REPLICA_MODELS; журнал шины, сессии и пользователи читаются из
+основной базы. Пока действует pin_primary() — запрос с записью или
+сессия, писавшая не дольше REPLICA_STICKY_SECONDS назад, — всё читается
+из основной базы, и пользователь видит свои изменения: такой запрос
+не читает общий кеш страниц, лент и карточек (is_pinned()).
+
+Страница, лента или карточка, собранная из реплики, не кладётся в
+общий кеш, если версия какого-нибудь её тега новее начала копии этой
+реплики (storable()): изменение после начала копии в реплику не
+попало. Изменение, закоммиченное уже после начала копии, могло
+сбросить теги раньше — поэтому после каждой копии теги из журнала
+шины, изменённые с начала предыдущей копии, сбрасываются ещё раз
+(cache.expire — без публикации в шину). Отметка хранит время начала
+копии и курсор журнала на её начало и пишется только после удачной
+копии, так что неудачная ничего не теряет.
+"""
+import fcntl
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from blogicum import metrics
+
+from . import breaker, bus
+from .cache import SITE_TAG, expire
+from .models import InvalidationEvent
+
+# Как часто перечитывать общие отметки реплик при выборе базы.
+READY_CHECK_INTERVAL = 1
+
+_primary_only = ContextVar('primary_only', default=False)
+# Чтения текущего запроса с реплик (track_reads): начало копии самой
+# старой из них.
+_reads = ContextVar('replica_reads', default=None)
+# Отметки реплик в памяти (у файловых реплик — в файле <имя>.sync).
+_local = {}
+_ready = {'checked': None, 'aliases': [], 'states': {}}
+_targets = {}
+_lock = threading.Lock()
+_refresher = {'pid': None, 'lock': threading.Lock()}
+
+
+@contextmanager
+def pin_primary(pinned=True):
+    """Внутри блока все запросы идут в основную базу."""
+    token = _primary_only.set(pinned or _primary_only.get())
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+def is_pinned():
+    return _primary_only.get()
+
+
+@contextmanager
+def track_reads():
+    """Внутри блока запоминается, с каких копий реплик шло чтение."""
+    token = _reads.set({'started': None})
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+def _note_read(alias):
+    reads = _reads.get()
+    if reads is None:
+        return
+    # У отметки без времени начала копии (старый формат) — 0: такие
+    # данные в общий кеш не попадут.
+    started = _ready['states'][alias].get('started', 0)
+    if reads['started'] is None or started < reads['started']:
+        reads['started'] = started
+
+
+def storable(versions):
+    """Можно ли положить в общий кеш данные, прочитанные в этом запросе.
+
+    versions — текущие версии их тегов (см. blog.cache.tag_versions).
+    """
+    reads = _reads.get()
+    started = reads and reads['started']
+    if started is None:
+        return True
+    return all(version / 1e9 <= started for version in versions.values())
+
+
+def ready_replicas():
+    """Реплики со свежей копией; отметки перечитываются раз в секунду."""
+    now = time.monotonic()
+    checked = _ready['checked']
+    if checked is None or now - checked >= READY_CHECK_INTERVAL:
+        states = {alias: read_state(alias)
+                  for alias in settings.DATABASE_REPLICAS}
+        states = {alias: state for alias, state in states.items()
+                  if _is_fresh(state)}
+        _ready.update(checked=now, aliases=list(states), states=states)
+    return _ready['aliases']
+
+
+def _is_fresh(state):
+    return (state is not None
+            and time.time() - state['synced'] < settings.REPLICA_MAX_LAG)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _primary_only.get():
+            return None
+        if model._meta.label not in settings.REPLICA_MODELS:
+            return None
+        replicas = ready_replicas()
+        if not replicas:
+            return None
+        alias = random.choice(replicas)
+        _note_read(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы: объекты из них совместимы.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def _target(alias):
+    # Соединение держится открытым: база в памяти живёт, пока открыто
+    # хотя бы одно соединение с ней.
+    if alias not in _targets:
+        _targets[alias] = sqlite3.connect(
+            _name(alias), uri=True, check_same_thread=False,
+        )
+    return _targets[alias]
+
+
+def _name(alias):
+    return str(connections[alias].settings_dict['NAME'])
+
+
+def _sync_path(alias):
+    """Файл общей отметки; None — реплика в памяти этого процесса."""
+    name = _name(alias)
+    if 'mode=memory' in name:
+        return None
+    return name + '.sync'
+
+
+def read_state(alias):
+    """Отметка последней копии.
+
+    {'started': начало копии, 'synced': конец, 'cursor': id журнала}.
+    """
+    path = _sync_path(alias)
+    if path is None:
+        return _local.get(alias)
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_state(alias, state):
+    path = _sync_path(alias)
+    if path is None:
+        _local[alias] = state
+    else:
+        partial = f'{path}.{os.getpid()}'
+        with open(partial, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(partial, path)
+    _ready['checked'] = None
+
+
+def changed_since(state):
+    """Теги, изменённые с начала копии state, по журналу шины."""
+    if time.time() - state['synced'] > settings.INVALIDATION_JOURNAL_TTL:
+        # Журнал мог потерять события: сбрасываем всё.
+        return {SITE_TAG}
+    keys = InvalidationEvent.objects.filter(
+        id__gt=state['cursor']
+    ).values_list('key', flat=True).distinct()
+    return {SITE_TAG if key == bus.ALL else key for key in keys}
+
+
+def refresh(alias):
+    """Копирует основную базу в реплику alias."""
+    previous = read_state(alias)
+    started = time.time()
+    cursor = bus.latest_id()
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    primary.connection.backup(_target(alias))
+    if previous is not None:
+        keys = changed_since(previous)
+        if keys:
+            expire(*keys)
+    write_state(alias, {'started': started, 'synced': time.time(),
+                        'cursor': cursor})
+
+
+def _is_stale(alias):
+    state = read_state(alias)
+    return (state is None or time.time() - state['synced']
+            >= settings.REPLICA_REFRESH_INTERVAL)
+
+
+def _locked_refresh(alias, force):
+    path = _sync_path(alias)
+    if path is None:
+        if force or _is_stale(alias):
+            refresh(alias)
+            return True
+        return False
+    with open(_name(alias) + '.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Реплику уже обновляет другой процесс.
+            return False
+        try:
+            # Отметка перечитывается под блокировкой: копию мог только
+            # что закончить другой процесс.
+            if force or _is_stale(alias):
+                refresh(alias)
+                return True
+            return False
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def refresh_stale(force=False):
+    """Обновляет устаревшие реплики; список обновлённых."""
+    if not settings.DATABASE_REPLICAS:
+        return []
+    if not _lock.acquire(blocking=False):
+        # Реплики уже обновляет соседний поток.
+        return []
+    try:
+        return [alias for alias in settings.DATABASE_REPLICAS
+                if _locked_refresh(alias, force)]
+    finally:
+        _lock.release()
+
+
+def tick():
+    """Шаг фонового обновления: ошибки считаются, но не выходят наружу.
+
+    При разомкнутом автомате (blog.breaker) база не копируется.
+    """
+    try:
+        return breaker.call_if_closed(refresh_stale) or []
+    except Exception:
+        metrics.incr('replicas.failed')
+        connections.close_all()
+        return []
+
+
+def _refresh_forever():
+    while True:
+        tick()
+        time.sleep(settings.REPLICA_REFRESH_INTERVAL)
+
+
+def start():
+    """Запускает фоновое обновление в этом процессе, если его ещё нет.
+
+    Вызывается на каждый запрос: потоки не переживают fork(), поэтому
+    воркер prefork-сервера запускает свой.
+    """
+    pid = os.getpid()
+    if _refresher['pid'] == pid:
+        return
+    with _refresher['lock']:
+        if _refresher['pid'] == pid:
+            return
+        _refresher['pid'] = pid
+        threading.Thread(
+            target=_refresh_forever, name='replica-refresh', daemon=True
+        ).start()
+
+
+def reset():
+    _local.clear()
+    _ready.update(checked=None, aliases=[], states={})
+    for target in _targets.values():
+        target.close()
+    _targets.clear()
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from blogicum import querybudget, sqlite
+
+from . import bus, comments, missing, querycache, stamps
+from .cache import drop_local_copies
+from .models import (
+    Category, Comment, Location, Post, comment_cascade_deferred,
+)
+
+User = get_user_model()
+
+bus.subscribe(drop_local_copies)
+connection_created.connect(sqlite.configure_connection)
+connection_created.connect(querybudget.install)
+connection_created.connect(querycache.install)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_keys(sender, instance, **kwargs):
+    # Пост могли перенести в другую категорию: старая лента тоже меняется.
+    old = Post.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._old_stamp_keys = stamps.post_keys(old) if old else set()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def stamp_post(sender, instance, **kwargs):
+    stamps.changed(*stamps.post_keys(instance),
+                   *getattr(instance, '_old_stamp_keys', ()))
+
+
+@receiver(post_save, sender=Post)
+def forget_missing_post(sender, instance, created, **kwargs):
+    if created:
+        missing.forget('post', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_comments(sender, instance, **kwargs):
+    # В отдельной базе комментарии не удаляются каскадом. При
+    # отложенном каскаде их удалит задача delete_comments.
+    if not comment_cascade_deferred():
+        comments.delete_for(post_id=instance.pk)
+
+
+@receiver(post_save, sender=User)
+def forget_missing_user(sender, instance, update_fields, **kwargs):
+    # И при переименовании: новое имя могли запомнить как несуществующее.
+    if not (update_fields and set(update_fields) <= {'last_login'}):
+        missing.forget('author', instance.username)
+
+
+@receiver(post_delete, sender=User)
+def delete_author_comments(sender, instance, **kwargs):
+    comments.delete_for(author_id=instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def stamp_comment(sender, instance, **kwargs):
+    # Счётчик комментариев виден во всех лентах с этим постом. Отметки
+    # и события шины — в базе комментария: в отдельной базе запись
+    # комментария не ждёт блокировки основной.
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        stamps.changed(*stamps.post_keys(post), using=instance._state.db)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def remember_category_keys(sender, instance, **kwargs):
+    old = (Category.objects.filter(pk=instance.pk).first()
+           if instance.pk else None)
+    instance._old_stamp_keys = (
+        stamps.category_change_keys(old) if old else set()
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def stamp_category(sender, instance, created=False, **kwargs):
+    stamps.changed(*stamps.category_change_keys(instance),
+                   *getattr(instance, '_old_stamp_keys', ()),
+                   *new_catalog_item_keys(created), site=True)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def stamp_location(sender, instance, created=False, **kwargs):
+    stamps.changed(f'location:{instance.pk}',
+                   *new_catalog_item_keys(created), site=True)
+
+
+def new_catalog_item_keys(created):
+    # Новые категории и места появляются редко, и заранее неизвестно,
+    # на каких страницах они окажутся: сбрасываем все.
+    return [stamps.SITE_KEY] if created else []
+
+
+@receiver(post_save, sender=User)
+def stamp_user(sender, instance, created, update_fields, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    keys = [f'author:{instance.username}']
+    if not created:
+        # Имя пользователя выводится в карточках постов и комментариях
+        # на любых страницах.
+        keys.append(stamps.SITE_KEY)
+    stamps.changed(*keys)
@@ -0,0 +1,140 @@
+"""Отметки изменений и условные GET-запросы (ETag / Last-Modified).
+
+Отметки об изменении комментариев хранятся в базе комментариев, если
+она отдельная (blog.comments): комментарий не пишет в основную базу.
+Отметка страницы — максимум по всем базам.
+"""
+import hashlib
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Max
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from . import bus
+from .cache import SITE_TAG, purge
+from .models import Post, VersionStamp
+
+SITE_KEY = SITE_TAG
+
+
+def bump(*keys, using=None):
+    """Отмечает, что данные под ключами изменились сейчас."""
+    keys = set(keys)
+    if not keys:
+        return
+    now = timezone.now()
+    stamps = VersionStamp.objects.using(using)
+    stamps.bulk_create(
+        [VersionStamp(key=key, updated_at=now) for key in keys],
+        ignore_conflicts=True,
+    )
+    stamps.filter(key__in=keys).update(updated_at=now)
+
+
+def changed(*keys, site=False, using=None):
+    """Данные под ключами изменились: отметки и сброс кеша по тегам.
+
+    site=True сдвигает и общую отметку — ETag всех страниц, — но
+    закешированные страницы сбрасываются только по ключам. using —
+    база для отметок и журнала шины.
+    """
+    bump(*keys, *([SITE_KEY] if site else []), using=using)
+    purge(*keys, using=using)
+
+
+def post_keys(post):
+    keys = {f'post:{post.pk}', 'feed:index'}
+    # При каскадном удалении автор или категория могут быть уже удалены.
+    try:
+        if post.author_id:
+            keys.add(f'author:{post.author.username}')
+        if post.category_id:
+            keys.add(f'category:{post.category.slug}')
+    except ObjectDoesNotExist:
+        keys.add(SITE_KEY)
+    return keys
+
+
+def category_change_keys(category):
+    # Снятие категории с публикации меняет ленты всех её авторов.
+    authors = Post.objects.filter(category=category).values_list(
+        'author__username', flat=True
+    ).distinct()
+    return {f'category:{category.slug}', 'feed:index',
+            *(f'author:{username}' for username in authors)}
+
+
+def get_last_modified(keys, posts):
+    """Максимум из отметок по ключам и дат публикации постов.
+
+    Дата публикации учитывается, потому что отложенный пост появляется
+    в ленте без какой-либо записи в базу. Общую отметку создаёт
+    миграция; без отметок возвращается None — страница отдаётся без
+    ETag и Last-Modified, чтение в базу не пишет.
+    """
+    stamp = max(filter(None, (
+        VersionStamp.objects.using(alias).filter(
+            key__in=[SITE_KEY, *keys]
+        ).aggregate(last=Max('updated_at'))['last']
+        for alias in bus.aliases()
+    )), default=None)
+    if stamp is None:
+        return None
+    published = posts.filter(
+        pub_date__lte=timezone.now()
+    ).aggregate(last=Max('pub_date'))['last']
+    return max(filter(None, (stamp, published)))
+
+
+def conditional_page(get_keys):
+    """Декоратор: ETag и Last-Modified по отметкам изменений.
+
+    get_keys(*args, **kwargs) возвращает (ключи, queryset постов),
+    от которых зависит страница. Шапка и ссылки редактирования зависят
+    от пользователя: ETag включает его id, а Last-Modified, одинаковый
+    для всех, отдаётся только анонимным.
+    """
+    def last_modified(request, *args, **kwargs):
+        if not hasattr(request, '_last_modified'):
+            keys, posts = get_keys(*args, **kwargs)
+            request._last_modified = get_last_modified(keys, posts)
+        return request._last_modified
+
+    def public_last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return last_modified(request, *args, **kwargs)
+
+    def etag(request, *args, **kwargs):
+        modified = last_modified(request, *args, **kwargs)
+        if modified is None:
+            return None
+        user_id = request.user.pk if request.user.is_authenticated else 0
+        value = (f'{request.get_full_path()}:{user_id}:'
+                 f'{modified.isoformat()}')
+        return hashlib.md5(value.encode()).hexdigest()
+
+    return condition(etag_func=etag, last_modified_func=public_last_modified)
+
+
+def index_keys():
+    return ['feed:index'], Post.objects.all()
+
+
+def category_keys(category_slug):
+    return (
+        [f'category:{category_slug}'],
+        Post.objects.filter(category__slug=category_slug),
+    )
+
+
+def profile_keys(username):
+    return (
+        [f'author:{username}'],
+        Post.objects.filter(author__username=username),
+    )
+
+
+def post_detail_keys(pk):
+    return [f'post:{pk}'], Post.objects.filter(pk=pk)
@@ -0,0 +1,203 @@
+"""Фоновая очередь задач в таблице базы (модель Task).
+
+Представление ставит задачу — enqueue(имя, **аргументы) — и сразу
+отвечает; выполняет её команда run_tasks в отдельном процессе. Задача —
+функция, зарегистрированная декоратором register, аргументы должны
+сериализоваться в JSON. Запись в очередь идёт в транзакции запроса:
+при откате задача пропадёт вместе с изменениями.
+
+Обработчик берёт задачи одним UPDATE (claim): строки переходят в
+состояние running с уникальной меткой обработчика, и другой
+обработчик их уже не возьмёт. Раньше берутся задачи с большим
+priority, не раньше run_at. Выполненная задача удаляется, упавшая
+повторяется через TASK_RETRY_DELAY·2^(n-1) секунд (не больше
+TASK_RETRY_MAX_DELAY), после TASK_MAX_ATTEMPTS попыток остаётся в
+таблице в состоянии failed. Задачи упавшего обработчика возвращаются в
+очередь через TASK_LOCK_TIMEOUT секунд (release_stale).
+
+Счётчики — tasks.*.
+"""
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import F
+from django.utils import timezone
+
+from blogicum import metrics
+
+from .models import Comment, Post, Task
+
+DELETE_BATCH_SIZE = 500
+EXIF_ORIENTATION = 0x0112
+
+_registry = {}
+
+
+def register(func):
+    """Декоратор: функция становится задачей с именем func.__name__."""
+    _registry[func.__name__] = func
+    return func
+
+
+def enqueue(name, priority=0, run_at=None, **payload):
+    if name not in _registry:
+        raise LookupError(f'Неизвестная задача: {name}')
+    return Task.objects.create(
+        name=name, payload=payload, priority=priority,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit=1):
+    """Забирает до limit готовых задач одним UPDATE."""
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    ready = Task.objects.filter(status=Task.QUEUED, run_at__lte=now)
+    candidates = ready.order_by('-priority', 'run_at', 'pk').values('pk')
+    # status и в основном условии: конкурент мог забрать строку, пока
+    # выполнялся подзапрос (в SQLite запись и так последовательна).
+    ready.filter(pk__in=candidates[:limit]).update(
+        status=Task.RUNNING, locked_by=token, locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(
+        Task.objects.filter(status=Task.RUNNING, locked_by=token)
+        .order_by('-priority', 'run_at', 'pk')
+    )
+
+
+def retry_delay(attempts):
+    delay = settings.TASK_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.TASK_RETRY_MAX_DELAY))
+
+
+def run(task):
+    """Выполняет взятую задачу; ошибка откладывает её или помечает failed."""
+    try:
+        func = _registry.get(task.name)
+        if func is None:
+            raise LookupError(f'Неизвестная задача: {task.name}')
+        func(**task.payload)
+    except Exception:
+        fail(task, traceback.format_exc())
+        return False
+    _held(task).delete()
+    metrics.incr('tasks.done')
+    return True
+
+
+def _held(task):
+    # Задачу могли вернуть в очередь (release_stale) и отдать другому
+    # обработчику: её строку трогает только тот, кто держит метку.
+    return Task.objects.filter(
+        pk=task.pk, status=Task.RUNNING, locked_by=task.locked_by
+    )
+
+
+def fail(task, error):
+    queued = _held(task)
+    if task.attempts >= settings.TASK_MAX_ATTEMPTS:
+        queued.update(status=Task.FAILED, last_error=error)
+        metrics.incr('tasks.failed')
+        return
+    queued.update(
+        status=Task.QUEUED, locked_by='', locked_at=None, last_error=error,
+        run_at=timezone.now() + retry_delay(task.attempts),
+    )
+    metrics.incr('tasks.retried')
+
+
+def release_stale():
+    """Возвращает в очередь задачи обработчиков, переставших отвечать."""
+    expired = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.TASK_LOCK_TIMEOUT
+        ),
+    )
+    return expired.update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def run_pending(worker='inline'):
+    """Выполняет в текущем потоке все готовые задачи; число выполненных."""
+    done = 0
+    while True:
+        claimed = claim(worker)
+        if not claimed:
+            return done
+        done += run(claimed[0])
+
+
+@register
+def send_email(subject, body, from_email, to, html=None):
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html:
+        message.attach_alternative(html, 'text/html')
+    message.send()
+
+
+@register
+def delete_comments(post_id):
+    """Комментарии удалённого поста (см. models.defer_comment_cascade).
+
+    Частями: короткие транзакции не держат блокировку записи SQLite.
+    """
+    while True:
+        batch = list(
+            Comment.objects.filter(post_id=post_id)
+            .values_list('pk', flat=True)[:DELETE_BATCH_SIZE]
+        )
+        if not batch:
+            return
+        Comment.objects.filter(pk__in=batch).delete()
+
+
+@register
+def process_image(post_id):
+    """Поворачивает по EXIF и уменьшает изображение поста.
+
+    Большая сторона — не больше POST_IMAGE_MAX_SIZE точек.
+    """
+    # Pillow нужен только обработчику очереди.
+    from PIL import Image, ImageOps
+
+    from . import stamps
+
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    limit = settings.POST_IMAGE_MAX_SIZE
+    with post.image.open('rb') as file, Image.open(file) as original:
+        image_format = original.format
+        orientation = original.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation == 1 and max(original.size) <= limit:
+            return
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((limit, limit))
+        buffer = BytesIO()
+        image.save(buffer, format=image_format)
+    # Сначала новый файл, потом ссылка на него, и только потом удаление
+    # старого: страница не остаётся без картинки, а при ошибке цел
+    # исходный файл.
+    storage, name = post.image.storage, post.image.name
+    saved = storage.save(name, ContentFile(buffer.getvalue()))
+    replaced = Post.objects.filter(pk=post.pk, image=name).update(
+        image=saved
+    )
+    if not replaced:
+        # Пост удалили или загрузили другое изображение.
+        storage.delete(saved)
+        return
+    storage.delete(name)
+    stamps.changed(*stamps.post_keys(post))
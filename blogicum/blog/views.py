@@ -1,58 +1,95 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
-from .models import Category, Post, Location, Comment
-from datetime import datetime
+from .models import Post, Comment
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.contrib import messages
 from django.contrib.auth.forms import UserChangeForm
-from django import forms
 from django.utils import timezone
 from django.views.decorators.http import require_POST
-from django.db.models import Count
+from django.utils.cache import patch_cache_control
+from django.db import transaction
+from .cache import (
+    add_cache_tags, add_post_tags, cache_page_with_holes, post_cache_tags,
+)
 from .forms import CommentForm, PostForm
+from .models import defer_comment_cascade
+from . import breaker, comments, feeds, lookups, missing, stamps, tasks
+from blogicum.querybudget import query_budget
 
 @login_required
 def accounts_profile_fix(request):
     return redirect('blog:index')
 
-def get_page_obj(request, queryset, per_page=10):
-    """Функция для создания page_obj"""
-    paginator = Paginator(queryset, per_page)
+def get_page_obj(request, queryset, per_page=10, feed_key=None):
+    """Функция для создания page_obj
+
+    С feed_key страница строится по кешированному списку id ленты
+    (см. blog.feeds), а queryset — все посты ленты без фильтра по дате
+    публикации.
+    """
+    if feed_key is not None:
+        paginator = Paginator(feeds.visible_ids(feed_key, queryset),
+                              per_page)
+    else:
+        paginator = Paginator(queryset, per_page)
     page_number = request.GET.get('page')
-    
+
     try:
         page_obj = paginator.page(page_number)
     except PageNotAnInteger:
         page_obj = paginator.page(1)
     except EmptyPage:
         page_obj = paginator.page(paginator.num_pages)
-    
+
+    if feed_key is not None:
+        page_obj.object_list = feeds.hydrate(page_obj.object_list)
     return page_obj
 
+
+def is_own_profile(request, username):
+    return (request.user.is_authenticated
+            and request.user.username == username)
+
+
+@missing.guard('author', User, 'username')
+@breaker.serve_stale
+@query_budget()
+@stamps.conditional_page(stamps.profile_keys)
+@cache_page_with_holes(bypass=is_own_profile)
 def user_profile(request, username):
     profile_user = get_object_or_404(User, username=username)
     user_posts = profile_user.post_set.all()
     if request.user != profile_user:
-        user_posts = user_posts.filter(
-            is_published=True,
-            pub_date__lte=timezone.now(),
-            category__is_published=True
+        page_obj = get_page_obj(
+            request,
+            user_posts.filter(is_published=True,
+                              category__is_published=True),
+            feed_key=f'author:{username}',
         )
-
-    user_posts = user_posts.annotate(
-        comment_count=Count('comments')
-    ).order_by('-pub_date')
-
-    paginator = Paginator(user_posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    else:
+        # Автору видны и неопубликованные посты: лента не кешируется.
+        page_obj = get_page_obj(
+            request,
+            feeds.card_queryset().filter(author=profile_user)
+            .order_by('-pub_date'),
+        )
+        lookups.attach(page_obj)
+        comments.attach_counts(page_obj)
+    own_profile = request.user == profile_user
+    add_cache_tags(request, f'author:{username}')
+    add_post_tags(request, page_obj)
 
     context = {
         'profile': profile_user,
         'page_obj': page_obj,
     }
-    return render(request, 'blog/profile.html', context)
+    response = render(request, 'blog/profile.html', context)
+    if own_profile:
+        # Владельцу видны неопубликованные посты — не кешируем.
+        patch_cache_control(response, private=True)
+    return response
 
 
 @login_required
@@ -93,6 +130,8 @@ def create_post(request):
                 messages.success(request, 'Пост успешно опубликован!')
 
             post.save()
+            if post.image:
+                tasks.enqueue('process_image', priority=5, post_id=post.pk)
 
             # Перенаправляем на страницу профиля пользователя
             return redirect('profile', username=request.user.username)
@@ -101,30 +140,35 @@ def create_post(request):
 
     context = {
         'form': form,
-        'categories': Category.objects.filter(is_published=True),
-        'locations': Location.objects.filter(is_published=True),
     }
 
     return render(request, 'blog/create.html', context)
 
 
+@breaker.serve_stale
+@query_budget()
+@stamps.conditional_page(stamps.index_keys)
+@cache_page_with_holes()
 def index(request):
-    current_time = datetime.now()
     post_list = Post.objects.filter(
         is_published=True,
         category__is_published=True,
-        pub_date__lte=current_time
-    ).annotate(comment_count=Count('comments')).order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    )
+    page_obj = get_page_obj(request, post_list, feed_key='feed:index')
+    add_cache_tags(request, 'feed:index')
+    add_post_tags(request, page_obj)
     context = {
         'page_obj': page_obj,
-        'post_list': post_list
+        'post_list': page_obj.object_list,
     }
     return render(request, 'blog/index.html', context)
 
 
+@missing.guard('post', Post, 'pk')
+@breaker.serve_stale
+@query_budget()
+@stamps.conditional_page(stamps.post_detail_keys)
+@cache_page_with_holes()
 def post_detail(request, pk):
 
     post_queryset = Post.objects.filter(pk=pk)
@@ -139,38 +183,43 @@ def post_detail(request, pk):
         )
 
     # Получаем пост или 404
-    post = get_object_or_404(post_queryset)
+    post = get_object_or_404(post_queryset.select_related('author'))
+    lookups.attach([post])
+    add_cache_tags(request, *post_cache_tags(post))
 
     # Остальной код...
-    comments = post.comments.order_by('created_at')
     form = CommentForm()
 
     context = {
         'post': post,
-        'comments': comments,
+        'comments': comments.for_post(post),
         'form': form,
         'is_author': request.user == post.author,
     }
-    return render(request, 'blog/detail.html', context)
-
-
+    response = render(request, 'blog/detail.html', context)
+    if not (post.is_published and post.category.is_published
+            and post.pub_date <= timezone.now()):
+        # Пост виден только автору — общий кеш для него не годится.
+        patch_cache_control(response, private=True)
+    return response
+
+
+@breaker.serve_stale
+@query_budget()
+@stamps.conditional_page(stamps.category_keys)
+@cache_page_with_holes()
 def category_posts(request, category_slug):
-    category = get_object_or_404(
-        Category,
-        slug=category_slug,
-        is_published=True
-    )
+    category = lookups.categories.get(slug=category_slug)
+    if category is None or not category.is_published:
+        raise Http404('Категория не найдена')
 
-    post_list = category.post_set.filter(
-        is_published=True,
-        pub_date__lte=timezone.now()
-    ).select_related('author', 'location').annotate(
-        comment_count=Count('comments')  # Добавляем аннотацию
-    ).order_by('-pub_date')
+    post_list = category.post_set.filter(is_published=True)
 
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(
+        request, post_list, feed_key=f'category:{category_slug}'
+    )
+    add_cache_tags(request, f'category:{category_slug}')
+    add_post_tags(request, page_obj)
 
     context = {
         'category': category,
@@ -207,6 +256,8 @@ def edit_post(request, pk):
             if post.pub_date and post.pub_date > timezone.now():
                 post.is_published = False
             post.save()
+            if 'image' in form.changed_data and post.image:
+                tasks.enqueue('process_image', priority=5, post_id=post.pk)
 
             messages.success(request, 'Пост успешно обновлен!')
             return redirect('blog:post_detail', pk=post.pk)
@@ -235,7 +286,11 @@ def delete_post(request, pk):
 
     if request.method == 'POST':
         print("POST запрос получен!")  # для отладки
-        post.delete()
+        # Комментарии удаляются в фоне: каскад с сигналом на каждый
+        # комментарий не задерживает ответ.
+        with transaction.atomic(), defer_comment_cascade():
+            tasks.enqueue('delete_comments', post_id=post.pk)
+            post.delete()
         print("Пост удален!")  # для отладки
         messages.success(request, 'Пост успешно удален!')
         return redirect('blog:index')
@@ -0,0 +1,489 @@
+"""Кеш в разделяемой памяти для prefork-воркеров одного хоста.
+
+Файл (обычно в /dev/shm) отображается в память всеми воркерами через
+mmap. Внутри:
+
+* заголовок и таблица классов слабов;
+* хеш-таблица из наборов (bucket) по WAYS записей: ключ ищется только
+  в своём наборе, при переполнении набора запись вытесняется по CLOCK;
+* слабы — области с чанками фиксированного размера (256 Б, 1 КБ, …);
+  значение кладётся в чанк наименьшего подходящего класса, при
+  нехватке чанков класс вытесняет старые по CLOCK.
+
+Чтение не берёт блокировок: у набора есть счётчик seq, у чанка —
+поколение gen (нечётные значения означают «идёт запись»). Читатель
+сверяет их до и после копирования и при расхождении считает это
+промахом. Писатели берут блокировку полосы наборов и, при выделении
+чанка, блокировку класса: fcntl.lockf между процессами плюс
+threading.Lock внутри процесса.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'BLGSHM01'
+HEADER = struct.Struct('<8sIII')            # magic, buckets, ways, classes
+HEADER_SIZE = 64
+CLASS = struct.Struct('<IIQI')              # chunk_size, chunks, offset, hand
+CLASS_SIZE = 32
+SEQ = struct.Struct('<Q')
+ENTRY = struct.Struct('<QQdIBBBx')          # hash, gen, expires, chunk,
+ENTRY_SIZE = ENTRY.size                     # class, used, ref
+CHUNK = struct.Struct('<QIBBH')             # gen, length, used, ref, pad
+KEY_LENGTH = struct.Struct('<H')
+
+DEFAULT_CLASSES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+LOCK_STRIPES = 64
+# Смещения для fcntl-блокировок: далеко за концом файла, чтобы не
+# пересекаться с данными (блокировки рекомендательные).
+LOCK_BASE = 1 << 40
+INIT_LOCK = LOCK_BASE - 1
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+class _SharedMap:
+    """Отображённый файл и блокировки; один на процесс и путь."""
+
+    def __init__(self, path, size, ways, classes):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._init(size, ways, classes)
+        self.stripe_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.class_locks = [threading.Lock() for _ in self.classes]
+
+    def _init(self, size, ways, classes):
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, INIT_LOCK)
+        try:
+            layout = self._layout(size, ways, classes)
+            total = layout['total']
+            if os.fstat(self.fd).st_size != total:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, total)
+            self.mm = mmap.mmap(self.fd, total)
+            magic, buckets, file_ways, file_classes = HEADER.unpack_from(
+                self.mm, 0
+            )
+            if (magic != MAGIC or buckets != layout['buckets']
+                    or file_ways != ways
+                    or file_classes != len(layout['classes'])):
+                self.mm[:] = bytes(total)
+                HEADER.pack_into(self.mm, 0, MAGIC, layout['buckets'], ways,
+                                 len(layout['classes']))
+                for index, (chunk_size, chunks, offset) in enumerate(
+                        layout['classes']):
+                    CLASS.pack_into(self.mm, self._class_offset(index),
+                                    chunk_size, chunks, offset, 0)
+            self.buckets = layout['buckets']
+            self.ways = ways
+            self.bucket_size = SEQ.size + ways * ENTRY_SIZE
+            self.buckets_offset = layout['buckets_offset']
+            self.classes = layout['classes']
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, INIT_LOCK)
+
+    @staticmethod
+    def _class_offset(index):
+        return HEADER_SIZE + index * CLASS_SIZE
+
+    @staticmethod
+    def _layout(size, ways, classes):
+        per_class = size // len(classes)
+        chunk_counts = [max(per_class // chunk, 1) for chunk in classes]
+        buckets = max(64, sum(chunk_counts) * 2 // ways)
+        bucket_size = SEQ.size + ways * ENTRY_SIZE
+        buckets_offset = HEADER_SIZE + len(classes) * CLASS_SIZE
+        offset = buckets_offset + buckets * bucket_size
+        layout = []
+        for chunk_size, chunks in zip(classes, chunk_counts):
+            layout.append((chunk_size, chunks, offset))
+            offset += chunk_size * chunks
+        return {'buckets': buckets, 'buckets_offset': buckets_offset,
+                'classes': layout, 'total': offset}
+
+    # Блокировки
+
+    def lock(self, threading_lock, region):
+        threading_lock.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, LOCK_BASE + region)
+        except BaseException:
+            threading_lock.release()
+            raise
+
+    def unlock(self, threading_lock, region):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, LOCK_BASE + region)
+        threading_lock.release()
+
+    def lock_bucket(self, bucket):
+        stripe = bucket % LOCK_STRIPES
+        self.lock(self.stripe_locks[stripe], stripe)
+        return stripe
+
+    def unlock_bucket(self, stripe):
+        self.unlock(self.stripe_locks[stripe], stripe)
+
+    def lock_class(self, index):
+        self.lock(self.class_locks[index], LOCK_STRIPES + index)
+
+    def unlock_class(self, index):
+        self.unlock(self.class_locks[index], LOCK_STRIPES + index)
+
+    # Наборы и записи
+
+    def bucket_offset(self, bucket):
+        return self.buckets_offset + bucket * self.bucket_size
+
+    def entry_offset(self, bucket, way):
+        return self.bucket_offset(bucket) + SEQ.size + way * ENTRY_SIZE
+
+    def read_seq(self, bucket):
+        return SEQ.unpack_from(self.mm, self.bucket_offset(bucket))[0]
+
+    def write_seq(self, bucket, value):
+        SEQ.pack_into(self.mm, self.bucket_offset(bucket), value)
+
+    def read_entry(self, bucket, way):
+        return ENTRY.unpack_from(self.mm, self.entry_offset(bucket, way))
+
+    def write_entry(self, bucket, way, *fields):
+        ENTRY.pack_into(self.mm, self.entry_offset(bucket, way), *fields)
+
+    def clear_entry(self, bucket, way):
+        offset = self.entry_offset(bucket, way)
+        self.mm[offset:offset + ENTRY_SIZE] = bytes(ENTRY_SIZE)
+
+    def set_entry_ref(self, bucket, way):
+        # Бит ссылки ставится без блокировки: гонка лишь сдвигает CLOCK.
+        self.mm[self.entry_offset(bucket, way) + 30] = 1
+
+    # Чанки
+
+    def chunk_offset(self, cls, chunk):
+        chunk_size, _, offset = self.classes[cls]
+        return offset + chunk * chunk_size
+
+    def read_chunk_header(self, cls, chunk):
+        return CHUNK.unpack_from(self.mm, self.chunk_offset(cls, chunk))
+
+    def chunk_alive(self, cls, chunk, gen):
+        chunk_gen, _, used, _, _ = self.read_chunk_header(cls, chunk)
+        return used and chunk_gen == gen
+
+    def allocate(self, cls, payload):
+        """Выделяет чанк (вытесняя по CLOCK) и пишет в него payload."""
+        chunk_size, chunks, _ = self.classes[cls]
+        class_offset = self._class_offset(cls)
+        evicted = False
+        self.lock_class(cls)
+        try:
+            hand = CLASS.unpack_from(self.mm, class_offset)[3]
+            for _ in range(chunks * 2 + 1):
+                chunk = hand
+                hand = (hand + 1) % chunks
+                gen, _, used, ref, _ = self.read_chunk_header(cls, chunk)
+                if used and ref:
+                    self.mm[self.chunk_offset(cls, chunk) + 13] = 0
+                    continue
+                evicted = bool(used)
+                break
+            gen = self._fill(cls, chunk, gen, payload)
+            struct.pack_into('<I', self.mm, class_offset + 16, hand)
+        finally:
+            self.unlock_class(cls)
+        return chunk, gen, evicted
+
+    def _fill(self, cls, chunk, gen, payload):
+        offset = self.chunk_offset(cls, chunk)
+        # Нечётное поколение: читатели этого чанка получат промах.
+        gen = (gen | 1) + 1
+        SEQ.pack_into(self.mm, offset, gen - 1)
+        start = offset + CHUNK.size
+        self.mm[start:start + len(payload)] = payload
+        CHUNK.pack_into(self.mm, offset, gen, len(payload), 1, 1, 0)
+        return gen
+
+    def rewrite(self, cls, chunk, gen, payload):
+        """Перезаписывает свой чанк на месте; None, если его уже забрали."""
+        self.lock_class(cls)
+        try:
+            if not self.chunk_alive(cls, chunk, gen):
+                return None
+            return self._fill(cls, chunk, gen, payload)
+        finally:
+            self.unlock_class(cls)
+
+    def free(self, cls, chunk, gen):
+        self.lock_class(cls)
+        try:
+            if self.chunk_alive(cls, chunk, gen):
+                self.mm[self.chunk_offset(cls, chunk) + 12] = 0
+        finally:
+            self.unlock_class(cls)
+
+
+def _get_map(path, size, ways, classes):
+    key = (path, os.getpid())
+    with _maps_lock:
+        shared = _maps.get(key)
+        if shared is None:
+            shared = _maps[key] = _SharedMap(path, size, ways, classes)
+        return shared
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._size = int(options.get('SIZE', 64 * 1024 * 1024))
+        self._ways = int(options.get('WAYS', 8))
+        self._classes = tuple(options.get('SLAB_CLASSES', DEFAULT_CLASSES))
+        self.counters = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    @property
+    def _map(self):
+        return _get_map(self._path, self._size, self._ways, self._classes)
+
+    def stats(self):
+        return dict(self.counters)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        encoded = key.encode()
+        digest = hashlib.blake2b(encoded, digest_size=8).digest()
+        return encoded, struct.unpack('<Q', digest)[0]
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    # Чтение без блокировок
+
+    def _find(self, shm, bucket, key_hash):
+        for _ in range(8):
+            seq = shm.read_seq(bucket)
+            if seq & 1:
+                continue
+            found = None
+            for way in range(shm.ways):
+                entry = shm.read_entry(bucket, way)
+                if entry[5] and entry[0] == key_hash:
+                    found = way, entry
+                    break
+            if shm.read_seq(bucket) == seq:
+                return found
+        return None
+
+    @staticmethod
+    def _chunk_value(shm, entry, encoded):
+        """Копирует значение из чанка записи или возвращает None."""
+        _, gen, expires, chunk, cls, _, _ = entry
+        if expires and expires <= time.time():
+            return None
+        offset = shm.chunk_offset(cls, chunk)
+        chunk_gen, length, used, _, _ = shm.read_chunk_header(cls, chunk)
+        if chunk_gen != gen or not used:
+            return None
+        data = shm.mm[offset + CHUNK.size:offset + CHUNK.size + length]
+        if shm.read_chunk_header(cls, chunk)[0] != gen:
+            # Чанк переписали, пока мы его копировали.
+            return None
+        key_length = KEY_LENGTH.unpack_from(data)[0]
+        if data[KEY_LENGTH.size:KEY_LENGTH.size + key_length] != encoded:
+            return None
+        shm.mm[offset + 13] = 1
+        return data[KEY_LENGTH.size + key_length:]
+
+    def _read(self, encoded, key_hash):
+        shm = self._map
+        bucket = key_hash % shm.buckets
+        found = self._find(shm, bucket, key_hash)
+        if found is None:
+            return None
+        way, entry = found
+        pickled = self._chunk_value(shm, entry, encoded)
+        if pickled is not None:
+            shm.set_entry_ref(bucket, way)
+        return pickled
+
+    def get(self, key, default=None, version=None):
+        pickled = self._read(*self._key(key, version))
+        if pickled is None:
+            self.counters['misses'] += 1
+            return default
+        self.counters['hits'] += 1
+        return pickle.loads(pickled)
+
+    def has_key(self, key, version=None):
+        return self._read(*self._key(key, version)) is not None
+
+    # Запись под блокировкой полосы
+
+    def _locked(self, key_hash, action):
+        shm = self._map
+        bucket = key_hash % shm.buckets
+        stripe = shm.lock_bucket(bucket)
+        try:
+            seq = shm.read_seq(bucket)
+            # Нечётный seq остаётся после упавшего писателя — чиним.
+            seq += seq & 1
+            shm.write_seq(bucket, seq + 1)
+            try:
+                return action(shm, bucket)
+            finally:
+                shm.write_seq(bucket, seq + 2)
+        finally:
+            shm.unlock_bucket(stripe)
+
+    def _live_way(self, shm, bucket, key_hash):
+        for way in range(shm.ways):
+            entry = shm.read_entry(bucket, way)
+            if entry[5] and entry[0] == key_hash:
+                _, gen, expires, chunk, cls, _, _ = entry
+                alive = (shm.chunk_alive(cls, chunk, gen)
+                         and not (expires and expires <= time.time()))
+                return way, entry, alive
+        return None, None, False
+
+    def _victim_way(self, shm, bucket):
+        """Свободная или устаревшая ячейка набора, иначе — по CLOCK."""
+        now = time.time()
+        entries = [shm.read_entry(bucket, way) for way in range(shm.ways)]
+        for way, (_, gen, expires, chunk, cls, used, _) in enumerate(entries):
+            if (not used or (expires and expires <= now)
+                    or not shm.chunk_alive(cls, chunk, gen)):
+                return way
+        for _ in range(2):
+            for way, entry in enumerate(entries):
+                if not entry[6]:
+                    return way
+                shm.write_entry(bucket, way, *entry[:6], 0)
+                entries[way] = (*entry[:6], 0)
+        return 0
+
+    def _write(self, shm, bucket, key_hash, encoded, pickled, expires):
+        payload = KEY_LENGTH.pack(len(encoded)) + encoded + pickled
+        size = CHUNK.size + len(payload)
+        cls = next((index for index, (chunk_size, _, _)
+                    in enumerate(shm.classes) if chunk_size >= size), None)
+        way, entry, _ = self._live_way(shm, bucket, key_hash)
+        if entry is not None and entry[4] == cls:
+            # Тот же класс: пишем в свой же чанк, не прокручивая CLOCK.
+            gen = shm.rewrite(cls, entry[3], entry[1], payload)
+            if gen is not None:
+                shm.write_entry(bucket, way, key_hash, gen, expires,
+                                entry[3], cls, 1, 1)
+                self.counters['sets'] += 1
+                return True
+        if entry is not None:
+            shm.free(entry[4], entry[3], entry[1])
+            shm.clear_entry(bucket, way)
+        if cls is None:
+            # Значение больше самого крупного чанка — не кешируем.
+            return False
+        if way is None:
+            way = self._victim_way(shm, bucket)
+            old = shm.read_entry(bucket, way)
+            if old[5]:
+                shm.free(old[4], old[3], old[1])
+                self.counters['evictions'] += 1
+        chunk, gen, evicted = shm.allocate(cls, payload)
+        if evicted:
+            self.counters['evictions'] += 1
+        shm.write_entry(bucket, way, key_hash, gen, expires, chunk, cls, 1, 1)
+        self.counters['sets'] += 1
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        encoded, key_hash = self._key(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self._expires(timeout)
+        return self._locked(key_hash, lambda shm, bucket: self._write(
+            shm, bucket, key_hash, encoded, pickled, expires
+        ))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        encoded, key_hash = self._key(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self._expires(timeout)
+
+        def action(shm, bucket):
+            if self._live_way(shm, bucket, key_hash)[2]:
+                return False
+            return self._write(shm, bucket, key_hash, encoded, pickled,
+                               expires)
+
+        return self._locked(key_hash, action)
+
+    def incr(self, key, delta=1, version=None):
+        encoded, key_hash = self._key(key, version)
+
+        def action(shm, bucket):
+            way, entry, alive = self._live_way(shm, bucket, key_hash)
+            pickled = (self._chunk_value(shm, entry, encoded)
+                       if alive else None)
+            if pickled is None:
+                raise ValueError(f"Key '{encoded.decode()}' not found")
+            value = pickle.loads(pickled) + delta
+            self._write(shm, bucket, key_hash, encoded,
+                        pickle.dumps(value, self.pickle_protocol), entry[2])
+            return value
+
+        return self._locked(key_hash, action)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        _, key_hash = self._key(key, version)
+        expires = self._expires(timeout)
+
+        def action(shm, bucket):
+            way, entry, alive = self._live_way(shm, bucket, key_hash)
+            if not alive:
+                return False
+            shm.write_entry(bucket, way, *entry[:2], expires, *entry[3:])
+            return True
+
+        return self._locked(key_hash, action)
+
+    def delete(self, key, version=None):
+        _, key_hash = self._key(key, version)
+
+        def action(shm, bucket):
+            way, entry, alive = self._live_way(shm, bucket, key_hash)
+            if entry is None:
+                return False
+            shm.free(entry[4], entry[3], entry[1])
+            shm.clear_entry(bucket, way)
+            return alive
+
+        return self._locked(key_hash, action)
+
+    def clear(self):
+        shm = self._map
+        for stripe in range(LOCK_STRIPES):
+            shm.lock(shm.stripe_locks[stripe], stripe)
+        try:
+            for bucket in range(shm.buckets):
+                seq = shm.read_seq(bucket)
+                seq += seq & 1
+                shm.write_seq(bucket, seq + 1)
+                for way in range(shm.ways):
+                    entry = shm.read_entry(bucket, way)
+                    if entry[5]:
+                        shm.free(entry[4], entry[3], entry[1])
+                        shm.clear_entry(bucket, way)
+                shm.write_seq(bucket, seq + 2)
+        finally:
+            for stripe in reversed(range(LOCK_STRIPES)):
+                shm.unlock(shm.stripe_locks[stripe], stripe)
@@ -0,0 +1,233 @@
+"""Двухуровневый кеш: LRU в памяти воркера (L1) поверх общего кеша (L2).
+
+L1 хранит копии значений не дольше L1_TIMEOUT секунд и ограничен по
+числу записей (MAX_ENTRIES) и суммарному размеру (MAX_BYTES). Запись
+и удаление идут сквозь оба уровня, так что в своём процессе уровни
+всегда согласованы; в чужих L1 изменённый ключ живёт до L1_TIMEOUT.
+
+incr/decr и clear — это инвалидация (счётчики поколений страниц),
+поэтому они увеличивают общий счётчик эпохи в L2. Каждый воркер
+сверяет эпоху не чаще раза в EPOCH_CHECK_INTERVAL секунд и при
+изменении сбрасывает свой L1.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+EPOCH_KEY = 'tiered:epoch'
+
+# Django создаёт экземпляр бэкенда на каждый поток, а L1 должен быть
+# общим для процесса, поэтому состояние хранится на уровне модуля.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Store:
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.epoch = None
+        self.epoch_checked = 0.0
+        self.counters = {
+            'l1_hits': 0, 'l2_hits': 0, 'misses': 0,
+            'sets': 0, 'evictions': 0, 'flushes': 0,
+        }
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._max_bytes = int(options.get('MAX_BYTES', 32 * 1024 * 1024))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._epoch_interval = float(options.get('EPOCH_CHECK_INTERVAL', 1))
+        with _stores_lock:
+            self._store = _stores.setdefault(
+                location or self._l2_alias, _Store()
+            )
+        self._l1 = self._store.entries
+        self._lock = self._store.lock
+        self.counters = self._store.counters
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, l1_entries=len(self._l1),
+                        l1_bytes=self._store.bytes)
+
+    # L1
+
+    def _local_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _l1_get(self, local_key):
+        with self._lock:
+            entry = self._l1.get(local_key)
+            if entry is None:
+                return None
+            pickled, expires = entry
+            if expires <= time.monotonic():
+                self._l1_drop(local_key)
+                return None
+            self._l1.move_to_end(local_key)
+            return pickled
+
+    def _l1_put(self, local_key, value, timeout):
+        ttl = self._l1_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            return
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        if len(pickled) > self._max_bytes:
+            return
+        with self._lock:
+            self._l1_drop(local_key)
+            self._l1[local_key] = (pickled, time.monotonic() + ttl)
+            self._store.bytes += len(pickled)
+            while (len(self._l1) > self._max_entries
+                   or self._store.bytes > self._max_bytes):
+                _, (evicted, _) = self._l1.popitem(last=False)
+                self._store.bytes -= len(evicted)
+                self.counters['evictions'] += 1
+
+    def _l1_drop(self, local_key):
+        entry = self._l1.pop(local_key, None)
+        if entry is not None:
+            self._store.bytes -= len(entry[0])
+
+    def drop_local(self, key, version=None):
+        """Удаляет копию ключа только из L1 этого процесса."""
+        with self._lock:
+            self._l1_drop(self._local_key(key, version))
+
+    def clear_local(self):
+        with self._lock:
+            self._l1.clear()
+            self._store.bytes = 0
+            self.counters['flushes'] += 1
+
+    def _check_epoch(self):
+        now = time.monotonic()
+        if now - self._store.epoch_checked < self._epoch_interval:
+            return
+        self._store.epoch_checked = now
+        epoch = self.l2.get(EPOCH_KEY, 0)
+        if epoch != self._store.epoch:
+            if self._store.epoch is not None:
+                self.clear_local()
+            self._store.epoch = epoch
+
+    def _bump_epoch(self):
+        try:
+            self._store.epoch = self.l2.incr(EPOCH_KEY)
+        except ValueError:
+            self.l2.add(EPOCH_KEY, 1, None)
+            self._store.epoch = self.l2.get(EPOCH_KEY)
+
+    @staticmethod
+    def _remaining(timeout):
+        return None if timeout is None else timeout - time.time()
+
+    # Интерфейс BaseCache
+
+    def get(self, key, default=None, version=None):
+        self._check_epoch()
+        local_key = self._local_key(key, version)
+        pickled = self._l1_get(local_key)
+        if pickled is not None:
+            self.counters['l1_hits'] += 1
+            return pickle.loads(pickled)
+        sentinel = object()
+        value = self.l2.get(key, sentinel, version=version)
+        if value is sentinel:
+            self.counters['misses'] += 1
+            return default
+        self.counters['l2_hits'] += 1
+        self._l1_put(local_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check_epoch()
+        found, missing = {}, []
+        for key in keys:
+            pickled = self._l1_get(self._local_key(key, version))
+            if pickled is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(pickled)
+        self.counters['l1_hits'] += len(found)
+        if missing:
+            from_l2 = self.l2.get_many(missing, version=version)
+            self.counters['l2_hits'] += len(from_l2)
+            self.counters['misses'] += len(missing) - len(from_l2)
+            for key, value in from_l2.items():
+                self._l1_put(self._local_key(key, version), value, None)
+            found.update(from_l2)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self.counters['sets'] += 1
+        backend_timeout = self.get_backend_timeout(timeout)
+        self._l1_put(self._local_key(key, version), value,
+                     self._remaining(backend_timeout))
+        return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_put(local_key, value,
+                         self._remaining(self.get_backend_timeout(timeout)))
+        else:
+            with self._lock:
+                self._l1_drop(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.drop_local(key, version)
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.drop_local(key, version)
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self._local_key(key, version)) is not None:
+            return True
+        return self.l2.has_key(key, version=version)  # noqa: W601
+
+    def incr(self, key, delta=1, version=None):
+        self.drop_local(key, version)
+        value = self.l2.incr(key, delta, version=version)
+        self._bump_epoch()
+        return value
+
+    def clear(self):
+        self.clear_local()
+        self.l2.clear()
+        self._bump_epoch()
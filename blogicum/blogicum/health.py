@@ -0,0 +1,121 @@
+"""Пробы живости и готовности для балансировщика.
+
+На HEALTH_LIVE_PATH и HEALTH_READY_PATH отвечает
+blog.middleware.HealthCheckMiddleware — первым в цепочке, без сессий,
+пользователей, шаблонов и разбора URL.
+
+Живость: процесс принимает запросы. Готовность: в каждой базе читается
+таблица django_migrations (пустой или подменённый файл не пройдёт),
+общий кеш пишет и читает, все миграции применены. Результат
+готовности процесс помнит HEALTH_CACHE_TIMEOUT секунд, поэтому частые
+пробы обходятся без запросов. Удачная проверка миграций запоминается до
+конца жизни процесса: откатывать их на работающем сайте не принято.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.utils.cache import add_never_cache_headers
+
+from blogicum import metrics
+
+PROBE_KEY = 'health:probe'
+
+_state = {'checked': None, 'checks': None, 'migrated': False}
+_lock = threading.Lock()
+
+
+def _aliases():
+    return sorted({DEFAULT_DB_ALIAS, settings.COMMENTS_DATABASE})
+
+
+def check_database():
+    for alias in _aliases():
+        with connections[alias].cursor() as cursor:
+            # SELECT 1 не трогает файл базы; нужна настоящая таблица.
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+            if cursor.fetchone() is None:
+                raise RuntimeError(f'empty database {alias}')
+
+
+def check_cache():
+    # Мимо L1 многоуровневого кеша: проверяется общее хранилище.
+    backend = getattr(cache, 'l2', cache)
+    value = time.time_ns()
+    backend.set(PROBE_KEY, value, 60)
+    if backend.get(PROBE_KEY) != value:
+        raise RuntimeError('cache read mismatch')
+
+
+def check_migrations():
+    if _state['migrated']:
+        return
+    for alias in _aliases():
+        executor = MigrationExecutor(connections[alias])
+        targets = executor.loader.graph.leaf_nodes()
+        if executor.migration_plan(targets):
+            raise RuntimeError(f'unapplied migrations in {alias}')
+    _state['migrated'] = True
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'migrations': check_migrations,
+}
+
+
+def run_checks():
+    results = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+        except Exception as error:
+            results[name] = f'fail: {type(error).__name__}'
+            metrics.incr(f'health.failed.{name}')
+        else:
+            results[name] = 'ok'
+    return results
+
+
+def readiness():
+    """Результаты проверок, не чаще раза в HEALTH_CACHE_TIMEOUT."""
+    checked = _state['checked']
+    now = time.monotonic()
+    if checked is not None and now - checked < settings.HEALTH_CACHE_TIMEOUT:
+        return _state['checks']
+    with _lock:
+        if _state['checked'] == checked:
+            _state.update(checks=run_checks(), checked=time.monotonic())
+        return _state['checks']
+
+
+def reset():
+    with _lock:
+        _state.update(checked=None, checks=None, migrated=False)
+
+
+def _json_response(data, status=200):
+    response = HttpResponse(
+        json.dumps(data), content_type='application/json', status=status
+    )
+    add_never_cache_headers(response)
+    return response
+
+
+def live():
+    return _json_response({'status': 'ok'})
+
+
+def ready():
+    checks = readiness()
+    ok = all(result == 'ok' for result in checks.values())
+    return _json_response(
+        {'status': 'ok' if ok else 'fail', 'checks': checks},
+        status=200 if ok else 503,
+    )
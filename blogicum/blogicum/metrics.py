@@ -0,0 +1,33 @@
+"""Счётчики процесса для диагностики кешей и нагрузки.
+
+Значения живут в памяти процесса: каждый воркер считает своё.
+Имена счётчиков — строки через точку, например
+«querycache.hits.blog_category».
+"""
+import threading
+from collections import defaultdict
+
+_counters = defaultdict(int)
+_lock = threading.Lock()
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def get(name):
+    return _counters.get(name, 0)
+
+
+def snapshot(prefix=''):
+    """Копия счётчиков, имена которых начинаются с prefix."""
+    with _lock:
+        return {name: value for name, value in _counters.items()
+                if name.startswith(prefix)}
+
+
+def reset(prefix=''):
+    with _lock:
+        for name in [name for name in _counters if name.startswith(prefix)]:
+            del _counters[name]
@@ -0,0 +1,262 @@
+"""Простой prefork WSGI-сервер на стандартной библиотеке.
+
+Мастер-процесс открывает слушающий сокет, прогревает приложение и
+порождает воркеры через fork(), так что скомпилированные шаблоны и
+импортированные модули делятся между воркерами. Воркер, превысивший
+потолок памяти или лимит запросов, завершается, а мастер запускает
+вместо него новый. Фоновый процесс, завершившийся быстрее
+background_max_delay секунд, перезапускается с паузой, удваивающейся
+с каждым таким завершением подряд: сломанный обработчик не
+превращается в цикл fork().
+
+Очередь соединений, ещё не принятых ни одним воркером, общая: её длину
+приложение получает из environ[BACKLOG_ENVIRON_KEY]() (см.
+blog.middleware.LoadSheddingMiddleware).
+"""
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+BACKLOG_ENVIRON_KEY = 'prefork.backlog'
+# struct tcp_info: восемь однобайтовых полей, затем rto, ato, snd_mss,
+# rcv_mss и unacked — у слушающего сокета это длина очереди accept().
+TCP_INFO_FORMAT = '8B5I'
+
+
+def current_rss():
+    """Текущий RSS процесса в байтах."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        import resource
+        # На Linux ru_maxrss в килобайтах; это пик, а не текущее значение,
+        # но для решения «пора ли перезапуститься» его достаточно.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def accept_backlog(sock):
+    """Соединения в очереди слушающего сокета; None, если ОС не сообщает.
+
+    Работает на Linux (TCP_INFO).
+    """
+    if not hasattr(socket, 'TCP_INFO'):
+        return None
+    try:
+        info = sock.getsockopt(
+            socket.IPPROTO_TCP, socket.TCP_INFO,
+            struct.calcsize(TCP_INFO_FORMAT),
+        )
+    except OSError:
+        return None
+    return struct.unpack_from(TCP_INFO_FORMAT, info)[-1]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WorkerServer(WSGIServer):
+    """WSGIServer, работающий поверх уже открытого сокета мастера."""
+
+    def __init__(self, sock, app, handler_class):
+        super().__init__(
+            sock.getsockname()[:2], handler_class, bind_and_activate=False
+        )
+        self.socket.close()
+        self.socket = sock
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+        self.setup_environ()
+        self.base_environ[BACKLOG_ENVIRON_KEY] = lambda: accept_backlog(sock)
+        self.set_app(app)
+        self.requests_served = 0
+
+    def finish_request(self, request, client_address):
+        self.requests_served += 1
+        super().finish_request(request, client_address)
+
+
+class PreforkServer:
+
+    def __init__(self, app, host='127.0.0.1', port=8000, workers=2,
+                 max_memory=None, max_requests=0, backlog=128,
+                 on_worker_start=None, access_log=True, background=None,
+                 background_delay=1, background_max_delay=60):
+        self.app = app
+        self.address = (host, port)
+        self.workers = workers
+        self.max_memory = max_memory
+        self.max_requests = max_requests
+        self.backlog = backlog
+        self.on_worker_start = on_worker_start
+        self.handler_class = (
+            WSGIRequestHandler if access_log else QuietRequestHandler
+        )
+        # Фоновый процесс рядом с воркерами (например, обработчик
+        # очереди задач): перезапускается, если завершился.
+        self.background = background
+        self.background_pid = None
+        self.background_delay = background_delay
+        self.background_max_delay = background_max_delay
+        # Быстрых завершений фонового процесса подряд и время, раньше
+        # которого он не перезапускается.
+        self.background_failures = 0
+        self.background_next = 0
+        self.children = {}
+        self.running = False
+        self.socket = None
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(self.address)
+        sock.listen(self.backlog)
+        # Соединение может забрать соседний воркер: неблокирующий accept()
+        # в этом случае просто вернёт управление в цикл.
+        sock.setblocking(False)
+        self.socket = sock
+        return sock
+
+    def run(self):
+        if self.socket is None:
+            self.bind()
+        self.running = True
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        try:
+            while self.running:
+                self._spawn_missing()
+                self._reap()
+        finally:
+            self._stop_children()
+            self.socket.close()
+
+    def _handle_stop(self, signum, frame):
+        self.running = False
+        # Мастер ждёт в waitpid(): пересылаем сигнал воркерам, чтобы
+        # ожидание завершилось.
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn_missing(self):
+        if (self.running and self.background is not None
+                and self.background_pid is None
+                and time.monotonic() >= self.background_next):
+            self.background_pid = self._fork(self._background_loop)
+        workers = len(self.children) - (self.background_pid is not None)
+        while self.running and workers < self.workers:
+            self._fork(self._worker_loop)
+            workers += 1
+
+    def _fork(self, target):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                target()
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def _reap(self):
+        # Пока фоновый процесс ждёт перезапуска, мастер не блокируется
+        # в waitpid(), а просыпается хотя бы раз в секунду.
+        wait = self._background_wait()
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG if wait else 0)
+        except ChildProcessError:
+            pid = 0
+        if not pid:
+            time.sleep(min(wait, 1))
+            return
+        started = self.children.pop(pid, None)
+        if pid == self.background_pid:
+            self.background_pid = None
+            self._schedule_background(pid, started)
+
+    def _background_wait(self):
+        if self.background is None or self.background_pid is not None:
+            return 0
+        return max(self.background_next - time.monotonic(), 0)
+
+    def respawn_delay(self, failures):
+        delay = self.background_delay * 2 ** (failures - 1)
+        return min(delay, self.background_max_delay)
+
+    def _schedule_background(self, pid, started):
+        now = time.monotonic()
+        if started is not None and now - started >= self.background_max_delay:
+            # Проработал дольше самой длинной паузы: не цикл падений.
+            self.background_failures = 0
+            self.background_next = now
+            return
+        self.background_failures += 1
+        delay = self.respawn_delay(self.background_failures)
+        self.background_next = now + delay
+        if self.running:
+            sys.stderr.write(
+                f'[{pid}] фоновый процесс завершился, перезапуск через '
+                f'{delay:g} с\n'
+            )
+
+    def _background_loop(self):
+        # Сигналы обрабатывает сам фоновый процесс; сокет ему не нужен.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.socket.close()
+        self.background()
+
+    def _stop_children(self):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        deadline = time.monotonic() + 10
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.children.pop(pid, None)
+
+    def _worker_loop(self):
+        alive = [True]
+
+        def stop(signum, frame):
+            alive[0] = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if self.on_worker_start is not None:
+            self.on_worker_start()
+        server = WorkerServer(self.socket, self.app, self.handler_class)
+        # Периодически выходим из select(), чтобы заметить SIGTERM.
+        server.timeout = 1
+        while alive[0]:
+            server.handle_request()
+            if (self.max_requests
+                    and server.requests_served >= self.max_requests):
+                break
+            if self.max_memory and current_rss() > self.max_memory:
+                sys.stderr.write(
+                    f'[{os.getpid()}] превышен потолок памяти, '
+                    'воркер будет перезапущен\n'
+                )
+                break
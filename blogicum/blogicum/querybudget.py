@@ -0,0 +1,85 @@
+"""Бюджет времени на запросы к SQLite в пределах одного HTTP-запроса.
+
+Каждое соединение с SQLite получает progress handler (install(),
+подключается к сигналу connection_created): раз в PROGRESS_STEPS
+инструкций виртуальной машины SQLite он сверяет время с дедлайном
+текущего запроса и, если тот прошёл, прерывает выполняемый запрос —
+SQLite отвечает ошибкой «interrupted».
+
+Дедлайн задаёт декоратор представления query_budget(). Прерванный
+запрос превращается в ответ 503 с Retry-After, событие считается в
+счётчиках querybudget.exceeded и querybudget.exceeded.<представление>.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError
+from django.http import HttpResponse
+
+from blogicum import metrics
+
+PROGRESS_STEPS = 1000
+RETRY_AFTER = 5
+UNAVAILABLE_BODY = (
+    '<!doctype html><title>Сервис перегружен</title>'
+    '<h1>Сервис перегружен</h1><p>Попробуйте обновить страницу позже.</p>'
+)
+
+_deadline = ContextVar('query_deadline', default=None)
+
+
+def _expired():
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() > deadline
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor == 'sqlite':
+        connection.connection.set_progress_handler(_expired, PROGRESS_STEPS)
+
+
+@contextmanager
+def budget(seconds):
+    """Запросы к SQLite внутри блока прерываются через seconds секунд."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def is_interrupted(error):
+    return isinstance(error, OperationalError) and 'interrupted' in str(error)
+
+
+def unavailable(retry_after=RETRY_AFTER):
+    """Заранее готовый ответ 503 без шаблонов и запросов к базе."""
+    response = HttpResponse(UNAVAILABLE_BODY, status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def query_budget(seconds=None):
+    """Декоратор представления: бюджет на его запросы к базе.
+
+    По умолчанию — QUERY_BUDGET секунд; при превышении — ответ 503.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = settings.QUERY_BUDGET if seconds is None else seconds
+            try:
+                with budget(limit):
+                    return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if not is_interrupted(error):
+                    raise
+                metrics.incr('querybudget.exceeded')
+                metrics.incr(f'querybudget.exceeded.{view.__name__}')
+                return unavailable()
+        return wrapper
+    return decorator
@@ -0,0 +1,134 @@
+"""Быстрое построение URL по имени маршрута.
+
+django.urls.reverse() на каждый вызов перебирает возможные шаблоны
+маршрута и проверяет результат регулярным выражением. Здесь все
+именованные маршруты вида path() из корневого URLconf (включая
+вложенные include() с пространствами имён) один раз компилируются в
+строки формата, и reverse() лишь подставляет значения, проверив
+каждое регуляркой его конвертера.
+
+Маршруты re_path(), повторяющиеся имена и всё, что не получилось
+разобрать, отдаются django.urls.reverse(), так что результат и ошибки
+(NoReverseMatch) совпадают с ним.
+"""
+import re
+import threading
+from urllib.parse import quote
+
+from django.core.signals import setting_changed
+from django.urls import get_resolver, get_script_prefix
+from django.urls import reverse as django_reverse
+from django.urls.converters import get_converter
+from django.urls.resolvers import RoutePattern, URLPattern, URLResolver
+
+PARAMETER_RE = re.compile(r'<(?:(?P<converter>[^>:]+):)?(?P<name>[^>]+)>')
+SAFE_CHARS = "!$&'()*+,;=" + '/~:@'
+# Строки из этих символов quote() не меняет.
+PLAIN_RE = re.compile(r"[\w.\-~!$&'()*+,;=/:@]*", re.ASCII)
+
+_routes = None
+_lock = threading.Lock()
+
+
+class Route:
+
+    def __init__(self, route):
+        self.params = []
+        self.converters = {}
+        parts = []
+        position = 0
+        for match in PARAMETER_RE.finditer(route):
+            parts.append(route[position:match.start()].replace('%', '%%'))
+            name = match.group('name')
+            converter = get_converter(match.group('converter') or 'str')
+            self.params.append(name)
+            self.converters[name] = (
+                converter, re.compile(converter.regex)
+            )
+            parts.append(f'%({name})s')
+            position = match.end()
+        parts.append(route[position:].replace('%', '%%'))
+        self.format = ''.join(parts)
+
+    def build(self, args, kwargs):
+        """Путь без префикса или None, если значения не подходят."""
+        if args:
+            if kwargs or len(args) != len(self.params):
+                return None
+            kwargs = dict(zip(self.params, args))
+        elif kwargs.keys() != self.converters.keys():
+            return None
+        values = {}
+        for name, value in kwargs.items():
+            converter, regex = self.converters[name]
+            try:
+                text = str(converter.to_url(value))
+            except ValueError:
+                return None
+            if not regex.fullmatch(text):
+                return None
+            values[name] = text
+        return self.format % values
+
+
+def _walk(patterns, prefix, namespace, routes, duplicates):
+    for pattern in patterns:
+        if not isinstance(pattern.pattern, RoutePattern):
+            continue
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            inner = namespace
+            if pattern.namespace:
+                inner = f'{namespace}{pattern.namespace}:'
+            _walk(pattern.url_patterns, route, inner, routes, duplicates)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            name = namespace + pattern.name
+            if name in routes:
+                duplicates.add(name)
+            routes[name] = Route(route)
+
+
+def compile_routes(urlconf=None):
+    """Словарь «имя маршрута → Route» для URLconf."""
+    routes, duplicates = {}, set()
+    _walk(get_resolver(urlconf).url_patterns, '', '', routes, duplicates)
+    for name in duplicates:
+        del routes[name]
+    return routes
+
+
+def get_routes():
+    global _routes
+    if _routes is None:
+        with _lock:
+            if _routes is None:
+                _routes = compile_routes()
+    return _routes
+
+
+def reset():
+    global _routes
+    _routes = None
+
+
+def _reset_on_urlconf_change(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        reset()
+
+
+setting_changed.connect(_reset_on_urlconf_change)
+
+
+def reverse(viewname, args=None, kwargs=None):
+    """Аналог django.urls.reverse для имён маршрутов; args — список."""
+    route = get_routes().get(viewname) if isinstance(viewname, str) else None
+    path = route.build(args or (), kwargs or {}) if route else None
+    if path is None:
+        return django_reverse(viewname, args=args, kwargs=kwargs)
+    url = get_script_prefix() + path
+    if not PLAIN_RE.fullmatch(url):
+        # Результат quote() уже в ASCII: iri_to_uri() его не меняет.
+        url = quote(url, safe=SAFE_CHARS)
+    if url.startswith('//'):
+        url = '/%2F' + url[2:]
+    return url
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,11 +44,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.HealthCheckMiddleware',
+    'blog.middleware.LoadSheddingMiddleware',
+    'blog.middleware.CircuitBreakerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blog.middleware.InvalidationBusMiddleware',
+    'blog.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog.middleware.AnonymousReadMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,11 +84,104 @@ EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Постоянные соединения: DB_CONN_MAX_AGE секунд (0 — новое соединение
+# на каждый запрос, none — без ограничения).
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': (
+            None if DB_CONN_MAX_AGE.lower() == 'none'
+            else int(DB_CONN_MAX_AGE)
+        ),
+    }
+}
+
+# Реплики для чтения (blog.replicas): BLOGICUM_DB_REPLICA=file — копия
+# в файле рядом с основной базой, memory — копия в памяти процесса.
+DATABASE_REPLICAS = []
+DB_REPLICA = os.environ.get('BLOGICUM_DB_REPLICA', '')
+if DB_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': {
+            'file': str(BASE_DIR / 'db.replica.sqlite3'),
+            'memory': 'file:blogicum-replica?mode=memory&cache=shared',
+        }[DB_REPLICA],
     }
+    DATABASE_REPLICAS.append('replica')
+
+# Комментарии в отдельной базе (blog.comments): BLOGICUM_COMMENTS_DB=1,
+# таблицы создаёт migrate --database=comments.
+DATABASES['comments'] = {
+    **DATABASES['default'],
+    'NAME': BASE_DIR / 'comments.sqlite3',
+}
+COMMENTS_DATABASE = (
+    'comments' if os.environ.get('BLOGICUM_COMMENTS_DB') else 'default'
+)
+COMMENTS_MODELS = ('blog.Comment',)
+
+DATABASE_ROUTERS = [
+    'blog.comments.CommentRouter',
+    'blog.replicas.ReplicaRouter',
+]
+# Модели, которые можно читать с реплик
+REPLICA_MODELS = ('blog.Post', 'blog.Category', 'blog.Location', 'blog.Comment')
+REPLICA_REFRESH_INTERVAL = 5
+# Реплика с копией старше (обновляющий процесс остановился) не читается
+REPLICA_MAX_LAG = 30
+# Сколько секунд после записи сессия читает из основной базы
+REPLICA_STICKY_SECONDS = 15
+REPLICA_STICKY_COOKIE = 'primary_db'
+
+# PRAGMA для каждого нового соединения с SQLite, см. blogicum.sqlite.
+SQLITE_PRAGMAS = {
+    # Действует только для новых файлов; старым нужен один VACUUM.
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Кеш: LRU в памяти воркера поверх общего для всех воркеров хранилища:
+# файла SQLite (по умолчанию) или разделяемой памяти
+# (BLOGICUM_SHARED_CACHE=shm).
+
+SHARED_CACHES = {
+    'sqlite': {
+        'BACKEND': 'blogicum.caches.sqlite.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+    'shm': {
+        'BACKEND': 'blogicum.caches.shared_memory.SharedMemoryCache',
+        'LOCATION': '/dev/shm/blogicum-cache',
+        'OPTIONS': {
+            'SIZE': 128 * 1024 * 1024,
+        },
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'blogicum.caches.tiered.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'MAX_ENTRIES': 2000,
+            'MAX_BYTES': 32 * 1024 * 1024,
+            'L1_TIMEOUT': 5,
+            'EPOCH_CHECK_INTERVAL': 1,
+        },
+    },
+    'shared': SHARED_CACHES[os.environ.get('BLOGICUM_SHARED_CACHE', 'sqlite')],
 }
 
 
@@ -130,4 +230,68 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CSRF_FAILURE_VIEW = 'blog.views.csrf_failure'
+# Cache-Control: max-age для анонимных страниц без cookie
+ANONYMOUS_CACHE_MAX_AGE = 60
+# Время жизни общих страниц в кеше (секунды); 0 — кеш отключён
+PAGE_CACHE_TIMEOUT = 60
+# Сколько ещё секунд отдавать устаревшую страницу, пока её обновляют
+PAGE_CACHE_STALE_TIMEOUT = 30
+# Сколько секунд помнить, что поста или пользователя нет (blog.missing)
+MISSING_CACHE_TIMEOUT = 30
+# Кеш результатов запросов (blog.querycache): только для запросов,
+# читающих эти маленькие и редко меняющиеся таблицы. auth_user сюда не
+# подходит: в кеш попали бы хеши паролей, а вход пользователя (UPDATE
+# last_login) сбрасывал бы кеш и писал в журнал шины.
+QUERY_CACHE_TABLES = ('blog_category', 'blog_location')
+QUERY_CACHE_TIMEOUT = 300
+# Время жизни списков id лент и карточек постов (blog.feeds)
+FEED_CACHE_TIMEOUT = 600
+
+# Пробы балансировщика (blogicum.health); результат готовности
+# кешируется в процессе на HEALTH_CACHE_TIMEOUT секунд
+HEALTH_LIVE_PATH = '/health/live/'
+HEALTH_READY_PATH = '/health/ready/'
+HEALTH_CACHE_TIMEOUT = 1
+
+# Сколько секунд публичное представление может ждать запросов к базе,
+# прежде чем ответить 503 (blogicum.querybudget)
+QUERY_BUDGET = 2
+
+# Отказ второстепенным запросам при перегрузке воркера
+# (blog.middleware.LoadSheddingMiddleware). Под serve.py считается очередь
+# слушающего сокета (LOAD_SHEDDING_MAX_BACKLOG), в многопоточном сервере —
+# одновременные запросы процесса (LOAD_SHEDDING_MAX_IN_FLIGHT).
+LOAD_SHEDDING_MAX_BACKLOG = 32
+LOAD_SHEDDING_MAX_IN_FLIGHT = 16
+# X-Request-Start принимается только от этих адресов. Прокси должен
+# перезаписывать заголовок клиента (proxy_set_header в nginx так и делает).
+LOAD_SHEDDING_TRUSTED_PROXIES = ('127.0.0.1', '::1')
+LOAD_SHEDDING_MAX_QUEUE_TIME = 1.0
+LOAD_SHEDDING_DEEP_PAGE = 5
+LOAD_SHEDDING_RETRY_AFTER = 10
+
+# Автомат защиты от недоступной базы (blog.breaker): сколько ошибок
+# за BREAKER_WINDOW секунд его размыкают, через сколько секунд пробовать
+# базу снова и сколько хранить последние удачные версии страниц
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_WINDOW = 30
+BREAKER_RESET_TIMEOUT = 15
+BREAKER_STALE_TIMEOUT = 24 * 60 * 60
+
+# Фоновая очередь задач (blog.tasks, команда run_tasks): число попыток,
+# задержка перед повтором (удваивается) и её предел, через сколько
+# секунд задача молчащего обработчика возвращается в очередь
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+TASK_LOCK_TIMEOUT = 10 * 60
+TASK_WORKERS = 4
+TASK_POLL_INTERVAL = 1
+# Большая сторона изображения поста после обработки в очереди
+POST_IMAGE_MAX_SIZE = 1600
+
+# Шина инвалидации (blog.bus): как часто воркер читает журнал и
+# сколько секунд журнал хранит события
+INVALIDATION_POLL_INTERVAL = 1
+INVALIDATION_JOURNAL_TTL = 600
 MEDIA_ROOT = BASE_DIR / 'media'
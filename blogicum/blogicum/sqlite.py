@@ -0,0 +1,41 @@
+"""Настройка соединений SQLite для работы под нагрузкой.
+
+Каждое новое соединение с SQLite-базой получает PRAGMA из настройки
+SQLITE_PRAGMAS (см. configure_connection, подключается к сигналу
+connection_created):
+
+- journal_mode=WAL — читатели не блокируют писателя и наоборот;
+- synchronous=NORMAL — в режиме WAL fsync только на checkpoint;
+- busy_timeout — ждать освобождения блокировки, а не сразу падать
+  с «database is locked»;
+- mmap_size, cache_size, temp_store — меньше системных вызовов и
+  временные таблицы в памяти.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas):
+    """Выполняет PRAGMA на курсоре DB-API; возвращает итоговые значения."""
+    applied = {}
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+        applied[name] = row[0] if row else None
+    return applied
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    cursor = connection.connection.cursor()
+    try:
+        apply_pragmas(cursor, pragmas)
+    finally:
+        cursor.close()
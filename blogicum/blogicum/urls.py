@@ -17,7 +17,9 @@ from django.contrib import admin
 from django.urls import path, include, reverse_lazy
 from django.views.generic.edit import CreateView
 from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.views import PasswordResetView
 from blog import views as blog_views
+from blog.forms import QueuedPasswordResetForm
 from django.conf import settings
 from django.views.generic import RedirectView
 from django.conf.urls.static import static
@@ -40,6 +42,11 @@ urlpatterns = [
         ),
         name='registration',
     ),
+    path(
+        'auth/password_reset/',
+        PasswordResetView.as_view(form_class=QueuedPasswordResetForm),
+        name='password_reset',
+    ),
     path('auth/', include('django.contrib.auth.urls')),
     path('profile/edit/', blog_views.edit_profile, name='edit_profile'),
     path('profile/<str:username>/', blog_views.user_profile, name='profile'),
@@ -0,0 +1,114 @@
+"""Прогрев процесса перед приёмом трафика.
+
+Всё, что обычно откладывается до первого запроса (импорт URLconf,
+компиляция шаблонов, загрузка каталога переводов, подключение к БД),
+выполняется здесь заранее.
+"""
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+from django.utils import translation
+
+from . import reversal
+
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+
+def enable_cached_loaders():
+    """Включает cached.Loader для всех движков Django-шаблонов.
+
+    При DEBUG = True Django не кеширует скомпилированные шаблоны,
+    поэтому оборачиваем загрузчики явно.
+    """
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        if any(_loader_name(loader) == CACHED_LOADER
+               for loader in engine.loaders):
+            continue
+        engine.loaders = [(CACHED_LOADER, list(engine.loaders))]
+        # template_loaders — cached_property, сбрасываем его.
+        engine.__dict__.pop('template_loaders', None)
+
+
+def _loader_name(loader):
+    return loader[0] if isinstance(loader, (list, tuple)) else loader
+
+
+def iter_template_names(backend):
+    """Возвращает имена всех шаблонов, доступных движку."""
+    dirs = list(backend.engine.dirs)
+    if backend.engine.app_dirs:
+        dirs.extend(get_app_template_dirs('templates'))
+    seen = set()
+    for directory in dirs:
+        directory = str(directory)
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                name = os.path.relpath(
+                    os.path.join(root, filename), directory
+                ).replace(os.sep, '/')
+                if name not in seen:
+                    seen.add(name)
+                    yield name
+
+
+def compile_templates():
+    """Компилирует все шаблоны, возвращает (скомпилировано, ошибок)."""
+    compiled = failed = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in iter_template_names(backend):
+            try:
+                backend.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError):
+                failed += 1
+            else:
+                compiled += 1
+    return compiled, failed
+
+
+def load_urlconf():
+    """Импортирует все URLconf и заполняет словари для reverse()."""
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+    for _, (_, namespace_resolver) in resolver.namespace_dict.items():
+        namespace_resolver.reverse_dict
+    reversal.get_routes()
+
+
+def load_translations():
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('')
+    translation.deactivate()
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def close_connections():
+    # Соединения нельзя передавать через fork(): каждый воркер
+    # открывает свои.
+    for connection in connections.all():
+        connection.close()
+
+
+def warm_up(connect=True):
+    """Полный прогрев; возвращает статистику для вывода в консоль."""
+    enable_cached_loaders()
+    load_urlconf()
+    load_translations()
+    compiled, failed = compile_templates()
+    if connect:
+        open_connections()
+    return {'templates': compiled, 'template_errors': failed}
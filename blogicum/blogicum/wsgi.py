@@ -5,6 +5,9 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
+
+Set DJANGO_WARMUP=1 to compile templates, load the URLconf and open
+database connections at import time instead of on the first request.
 """
 
 import os
@@ -14,3 +17,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
 
 application = get_wsgi_application()
+
+if os.environ.get('DJANGO_WARMUP'):
+    from blogicum.warmup import warm_up
+
+    warm_up()
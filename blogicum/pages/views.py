@@ -1,6 +1,17 @@
+from functools import lru_cache
+from types import SimpleNamespace
+
+from django.http import HttpResponseNotFound, HttpResponseServerError
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.html import escape
 from django.views.generic import TemplateView
 
+from blog.cache import fill_holes
+from blog.missing import NotFound
+
+URL_MARKER = '[[url]]'
+
 
 class AboutView(TemplateView):
     template_name = 'pages/about.html'
@@ -15,8 +26,32 @@ def csrf_failure(request, reason=''):
 
 
 def page_not_found(request, exception):
+    if isinstance(exception, NotFound):
+        # Несуществующий пост или профиль: готовая страница без
+        # рендеринга шаблонов и запросов к базе.
+        content = prerendered_not_found().replace(
+            URL_MARKER, escape(request.build_absolute_uri()), 1
+        )
+        return HttpResponseNotFound(fill_holes(request, content))
     return render(request, 'pages/404.html', status=404)
 
 
+@lru_cache(maxsize=None)
+def prerendered_not_found():
+    # Шапка с данными пользователя остаётся меткой (blog.cache).
+    request = SimpleNamespace(
+        hole_punching=True, build_absolute_uri=URL_MARKER,
+        resolver_match=None,
+    )
+    return render_to_string('pages/404.html', {'request': request})
+
+
+@lru_cache(maxsize=None)
+def prerendered_server_error():
+    # Без запроса: ни сессии, ни пользователя, ни запросов к базе —
+    # они сами могут быть причиной ошибки или перегрузки.
+    return render_to_string('pages/500.html')
+
+
 def server_error(request):
-    return render(request, 'pages/500.html', status=500)
+    return HttpResponseServerError(prerendered_server_error())
@@ -1,5 +1,7 @@
 import os
 import re
+import shutil
+import tempfile
 import time
 from http import HTTPStatus
 from inspect import getsource
@@ -35,6 +37,19 @@ UrlRepr = NamedTuple("UrlRepr", [("url", str), ("repr", str)])
 TitledUrlRepr = TypeVar("TitledUrlRepr", bound=Tuple[UrlRepr, str])
 
 
+def pytest_configure(config):
+    # Общий кеш тестов — во временном каталоге, а не в cache.sqlite3
+    # сервера разработки. Бэкенды кеша создаются при первом обращении,
+    # поэтому достаточно поменять LOCATION до запуска тестов.
+    from django.conf import settings
+
+    shared = settings.CACHES["shared"]
+    if shared["BACKEND"] == "blogicum.caches.sqlite.SQLiteCache":
+        directory = tempfile.mkdtemp(prefix="blogicum-cache-")
+        config.add_cleanup(lambda: shutil.rmtree(directory, True))
+        shared["LOCATION"] = os.path.join(directory, "cache.sqlite3")
+
+
 @pytest.fixture(autouse=True)
 def enable_debug_false():
     with override_settings(DEBUG=False):
@@ -0,0 +1,31 @@
+import pytest
+from django.utils.cache import has_vary_header
+
+
+@pytest.mark.django_db
+def test_anonymous_feed_is_publicly_cacheable(
+    client, post_with_published_location
+):
+    post = post_with_published_location
+    for url in ("/", f"/posts/{post.id}/"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert not has_vary_header(response, "Cookie"), (
+            "Анонимная страница без cookie не должна отдавать `Vary: Cookie`."
+        )
+        assert "public" in response["Cache-Control"]
+        assert not response.cookies
+
+
+@pytest.mark.django_db
+def test_logged_in_response_is_not_public(user_client):
+    response = user_client.get("/")
+    assert response.status_code == 200
+    assert has_vary_header(response, "Cookie")
+    assert "public" not in response.get("Cache-Control", "")
+
+
+@pytest.mark.django_db
+def test_page_with_csrf_token_is_not_public(client):
+    response = client.get("/auth/login/")
+    assert "public" not in response.get("Cache-Control", "")
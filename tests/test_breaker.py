@@ -0,0 +1,144 @@
+import pytest
+from django.db import OperationalError
+
+from blog import breaker, feeds, replicas
+from blog.cache import purge
+from blogicum import metrics
+
+from test_query_budget import run_slow_query
+
+
+@pytest.fixture
+def breaker_settings(settings):
+    settings.BREAKER_FAILURE_THRESHOLD = 1
+    settings.BREAKER_RESET_TIMEOUT = 60
+    breaker.reset()
+    yield settings
+    breaker.reset()
+
+
+@pytest.mark.django_db
+def test_locked_database_serves_last_good_page(
+    breaker_settings, client, post_with_published_location, monkeypatch
+):
+    response = client.get('/')
+    assert response.status_code == 200
+    purge('site')
+
+    def locked(*args, **kwargs):
+        raise OperationalError('database is locked')
+
+    monkeypatch.setattr(feeds, 'visible_ids', locked)
+    response = client.get('/')
+    content = response.content.decode()
+    assert response.status_code == 200, (
+        'При заблокированной базе главная должна отдаваться из последней '
+        'удачной версии.'
+    )
+    assert post_with_published_location.title in content
+    assert 'только для чтения' in content, (
+        'Сохранённая версия страницы должна быть помечена.'
+    )
+    assert breaker.is_open(), (
+        'Ошибки блокировки базы должны размыкать автомат.'
+    )
+
+
+@pytest.mark.django_db
+def test_writes_rejected_while_open(
+    breaker_settings, user_client, post_with_published_location
+):
+    breaker.record_failure()
+    response = user_client.post(
+        f'/posts/{post_with_published_location.pk}/comment/',
+        {'text': 'Комментарий'},
+    )
+    assert response.status_code == 503, (
+        'При разомкнутом автомате запись должна вежливо отклоняться.'
+    )
+    assert response['Retry-After']
+
+
+@pytest.mark.django_db
+def test_breaker_closes_after_successful_trial(breaker_settings, client):
+    breaker.record_failure()
+    assert breaker.is_open()
+    breaker_settings.BREAKER_RESET_TIMEOUT = 0
+    assert client.get('/').status_code == 200
+    assert not breaker.is_open(), (
+        'Автомат должен замыкаться, когда база снова отвечает.'
+    )
+
+
+@pytest.mark.django_db
+def test_trial_answered_from_cache_still_probes_database(
+    breaker_settings, client, post_with_published_location, monkeypatch
+):
+    assert client.get('/').status_code == 200
+    breaker.record_failure()
+    breaker_settings.BREAKER_RESET_TIMEOUT = 0
+
+    def locked():
+        raise OperationalError('database is locked')
+
+    monkeypatch.setattr(breaker, 'probe', locked)
+    response = client.get('/')
+    assert 'только для чтения' in response.content.decode()
+    assert breaker.is_open(), (
+        'Пробный запрос, отданный из кеша, должен проверять базу.'
+    )
+
+
+@pytest.mark.django_db
+def test_failed_trial_does_not_close_breaker(breaker_settings, rf):
+    breaker.record_failure()
+    breaker_settings.BREAKER_RESET_TIMEOUT = 0
+
+    @breaker.serve_stale
+    def broken(request):
+        raise ValueError('ошибка')
+
+    with pytest.raises(ValueError):
+        broken(rf.get('/'))
+    assert breaker.is_open(), (
+        'Ошибка представления не должна замыкать автомат.'
+    )
+
+
+@pytest.mark.django_db
+def test_replica_refresh_error_counted_by_breaker(
+    breaker_settings, monkeypatch
+):
+    breaker_settings.DATABASE_REPLICAS = ['replica']
+
+    def locked():
+        raise OperationalError('database is locked')
+
+    monkeypatch.setattr(replicas, 'refresh_stale', locked)
+    assert replicas.tick() == [], (
+        'Ошибка фонового обновления реплики не должна выходить наружу.'
+    )
+    assert breaker.is_open()
+    monkeypatch.setattr(replicas, 'refresh_stale', lambda: pytest.fail(
+        'При разомкнутом автомате реплика не должна обновляться.'
+    ))
+    replicas.tick()
+
+
+@pytest.mark.django_db
+def test_slow_page_answered_by_budget_not_breaker(
+    breaker_settings, client, post_with_published_location, monkeypatch
+):
+    breaker_settings.QUERY_BUDGET = 0.05
+    metrics.reset('querybudget.')
+    purge('site')
+    monkeypatch.setattr(feeds, 'visible_ids',
+                        lambda *args, **kwargs: run_slow_query())
+    response = client.get('/')
+    assert response.status_code == 503
+    assert metrics.get('querybudget.exceeded.index') == 1, (
+        'Прерванный бюджетом запрос должен учитываться query_budget.'
+    )
+    assert not breaker.is_open(), (
+        'Медленная страница не должна размыкать автомат для всего воркера.'
+    )
@@ -0,0 +1,151 @@
+import os
+import time
+
+import pytest
+from django.core.cache import caches
+from django.test import override_settings
+
+from blogicum.caches.sqlite import SQLiteCache
+
+
+@pytest.fixture
+def tiered(tmp_path):
+    cache_settings = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'tiered': {
+            'BACKEND': 'blogicum.caches.tiered.TieredCache',
+            'LOCATION': f'tiered-{tmp_path.name}',
+            'OPTIONS': {'L2': 'l2', 'MAX_ENTRIES': 3, 'L1_TIMEOUT': 60},
+        },
+        'l2': {
+            'BACKEND': 'blogicum.caches.sqlite.SQLiteCache',
+            'LOCATION': tmp_path / 'l2.sqlite3',
+        },
+    }
+    with override_settings(CACHES=cache_settings):
+        yield caches['tiered']
+
+
+def test_sqlite_cache_basic_operations(tmp_path):
+    cache = SQLiteCache(tmp_path / 'cache.sqlite3', {})
+    assert cache.get('missing') is None
+    cache.set('key', {'a': 1})
+    assert cache.get('key') == {'a': 1}
+    assert cache.add('key', 'other') is False
+    assert cache.add('new', 'value') is True
+    cache.set('counter', 1)
+    assert cache.incr('counter', 5) == 6
+    assert cache.get_many(['key', 'new', 'missing']) == {
+        'key': {'a': 1}, 'new': 'value'
+    }
+    assert cache.delete('key') is True
+    assert cache.get('key') is None
+
+
+def test_sqlite_cache_expiry(tmp_path):
+    cache = SQLiteCache(tmp_path / 'cache.sqlite3', {})
+    cache.set('short', 'value', timeout=0.05)
+    assert cache.add('short', 'again') is False
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.add('short', 'again') is True
+
+
+def test_tiered_cache_hits_and_coherence(tiered):
+    tiered.set('key', 'value')
+    assert tiered.get('key') == 'value'
+    assert tiered.stats()['l1_hits'] == 1
+
+    # Запись другого воркера прямо в L2 не видна, пока жива копия в L1...
+    tiered.l2.set('key', 'changed')
+    assert tiered.get('key') == 'value'
+    # ...а удаление через кеш сбрасывает оба уровня.
+    tiered.delete('key')
+    assert tiered.get('key') is None
+    assert tiered.stats()['misses'] == 1
+
+    tiered.l2.set('from_l2', 1)
+    assert tiered.get('from_l2') == 1
+    assert tiered.stats()['l2_hits'] == 1
+
+
+def test_tiered_cache_lru_eviction(tiered):
+    for key in 'abcd':
+        tiered.set(key, key)
+    stats = tiered.stats()
+    assert stats['l1_entries'] == 3
+    assert stats['evictions'] == 1
+    # Вытесненный из L1 ключ по-прежнему доступен из L2.
+    assert tiered.get('a') == 'a'
+
+
+def test_tiered_cache_epoch_flushes_local_copies(tiered):
+    tiered.set('generation', 1)
+    tiered.get('generation')
+    tiered._check_epoch()
+    tiered.l2.set('generation', 2)
+    tiered.l2.set('tiered:epoch', 100, None)
+    tiered._store.epoch_checked = 0
+    assert tiered.get('generation') == 2
+
+
+@pytest.fixture
+def shm_cache(tmp_path):
+    from blogicum.caches.shared_memory import SharedMemoryCache
+
+    return SharedMemoryCache(
+        tmp_path / 'shm', {'OPTIONS': {'SIZE': 512 * 1024}}
+    )
+
+
+def test_shared_memory_cache_basic_operations(shm_cache):
+    shm_cache.set('key', {'a': 1})
+    assert shm_cache.get('key') == {'a': 1}
+    assert shm_cache.add('key', 'other') is False
+    assert shm_cache.add('new', 'value') is True
+    shm_cache.set('counter', 1)
+    assert shm_cache.incr('counter', 2) == 3
+    shm_cache.set('key', 'x' * 5000)  # другой класс слабов
+    assert shm_cache.get('key') == 'x' * 5000
+    assert shm_cache.delete('key') is True
+    assert shm_cache.get('key') is None
+    shm_cache.set('short', 1, timeout=0.05)
+    time.sleep(0.1)
+    assert shm_cache.get('short') is None
+    shm_cache.clear()
+    assert shm_cache.get('new') is None
+
+
+def test_shared_memory_cache_evicts_when_full(shm_cache):
+    for i in range(2000):
+        shm_cache.set(f'key{i}', 'v' * 500)
+    stored = sum(
+        shm_cache.get(f'key{i}') is not None for i in range(2000)
+    )
+    assert 0 < stored < 2000
+    assert shm_cache.get('key1999') == 'v' * 500
+    assert shm_cache.stats()['evictions'] > 0
+
+
+def test_shared_memory_cache_is_shared_between_processes(shm_cache):
+    import multiprocessing
+
+    shm_cache.set('counter', 0)
+
+    def worker():
+        for _ in range(200):
+            shm_cache.incr('counter')
+        shm_cache.set(f'pid:{os.getpid()}', True)
+
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=worker) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert shm_cache.get('counter') == 600
+    for process in processes:
+        assert shm_cache.get(f'pid:{process.pid}') is True
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+from django.core.cache import cache
+
+from blog.cache import get_or_compute
+
+
+def test_stale_value_served_while_another_worker_recomputes():
+    key = 'test:stale'
+    cache.set(key, ('old', time.time() - 1), 60)
+    cache.add(f'lock:{key}', 1, 10)  # пересчитывает «другой воркер»
+    try:
+        value = get_or_compute(
+            key, lambda: 'new', timeout=10, stale_timeout=10
+        )
+    finally:
+        cache.delete(f'lock:{key}')
+    assert value == 'old'
+
+
+def test_miss_is_computed_once():
+    key = 'test:miss'
+    cache.delete(key)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'value'
+
+    assert get_or_compute(key, compute, timeout=10) == 'value'
+    assert get_or_compute(key, compute, timeout=10) == 'value'
+    assert len(calls) == 1
+
+
+def test_waiting_worker_falls_back_to_compute():
+    key = 'test:wait'
+    cache.delete(key)
+    cache.add(f'lock:{key}', 1, 10)
+    try:
+        value = get_or_compute(key, lambda: 'mine', timeout=10, wait=0.1)
+    finally:
+        cache.delete(f'lock:{key}')
+    assert value == 'mine'
+    assert cache.get(key) is None
+
+
+def test_background_refresh():
+    key = 'test:background'
+    cache.set(key, ('old', time.time() - 1), 60)
+    assert get_or_compute(
+        key, lambda: 'new', timeout=10, stale_timeout=10
+    ) == 'old'
+    deadline = time.time() + 2
+    while time.time() < deadline and cache.get(key)[0] != 'new':
+        time.sleep(0.01)
+    assert cache.get(key)[0] == 'new'
+
+
+def test_waiters_released_when_value_is_not_cacheable():
+    key = 'test:uncacheable'
+    cache.delete(key)
+    cache.delete(f'lock:{key}')
+
+    def not_cacheable():
+        raise LookupError('404')
+
+    with pytest.raises(LookupError):
+        get_or_compute(key, not_cacheable, timeout=10)
+    started = time.monotonic()
+    value = get_or_compute(key, lambda: 'mine', timeout=10, wait=2)
+    cache.delete(f'lock:{key}')
+    assert value == 'mine'
+    assert time.monotonic() - started < 0.5, (
+        'Если считающий воркер не сохранил значение, остальные не должны '
+        'ждать его до конца wait.'
+    )
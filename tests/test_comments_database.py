@@ -0,0 +1,108 @@
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from blog import bus
+from blog.models import Comment, InvalidationEvent
+
+DATABASES = ['default', 'comments']
+
+
+@pytest.fixture
+def comments_db(settings):
+    settings.COMMENTS_DATABASE = 'comments'
+
+
+@pytest.mark.django_db(databases=DATABASES)
+def test_comment_stored_in_separate_database(
+    comments_db, user_client, post_with_published_location
+):
+    post = post_with_published_location
+    user_client.post(f'/posts/{post.pk}/comment/', {'text': 'Отдельно'})
+    stored = Comment.objects.using('comments').filter(post_id=post.pk)
+    assert stored.exists(), (
+        'Комментарий должен сохраняться в базе комментариев.'
+    )
+    assert not Comment.objects.using('default').exists(), (
+        'Основная база не должна получать записи комментариев.'
+    )
+
+    response = user_client.get(f'/posts/{post.pk}/')
+    assert 'Отдельно' in response.content.decode(), (
+        'Страница поста должна показывать комментарии из отдельной базы.'
+    )
+    response = user_client.get('/')
+    assert 'Комментарии (1)' in response.content.decode(), (
+        'Счётчик комментариев в ленте должен учитывать отдельную базу.'
+    )
+
+
+@pytest.mark.django_db(databases=DATABASES)
+def test_comments_deleted_with_post(
+    comments_db, mixer, user, post_with_published_location
+):
+    post = post_with_published_location
+    comment = Comment(post=post, author=user, text='Текст')
+    comment.save()
+    assert comment._state.db == 'comments'
+    assert comment.post == post and comment.author == user
+    post.delete()
+    assert not Comment.objects.filter(pk=comment.pk).exists(), (
+        'Комментарии удалённого поста должны удаляться и в отдельной базе.'
+    )
+
+
+@pytest.mark.django_db(databases=DATABASES)
+def test_comment_post_does_not_write_default_database(
+    comments_db, user_client, post_with_published_location
+):
+    post = post_with_published_location
+    user_client.get(f'/posts/{post.pk}/')
+    with CaptureQueriesContext(connections['default']) as queries:
+        response = user_client.post(
+            f'/posts/{post.pk}/comment/', {'text': 'Без записи'}
+        )
+    assert response.status_code == 302
+    writes = [
+        query['sql'] for query in queries.captured_queries
+        if query['sql'].lstrip().split()[0].upper()
+        in ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+    ]
+    assert not writes, (
+        'Комментарий в отдельной базе не должен писать в основную: '
+        f'{writes}'
+    )
+    assert InvalidationEvent.objects.using('comments').exists(), (
+        'События шины об изменении комментария пишутся в его базу.'
+    )
+
+
+@pytest.mark.django_db(databases=DATABASES)
+def test_comment_in_separate_database_changes_etag(
+    comments_db, client, user, post_with_published_location
+):
+    post = post_with_published_location
+    url = f'/posts/{post.pk}/'
+    etag = client.get(url)['ETag']
+    Comment.objects.create(post=post, author=user, text='Новый')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200, (
+        'Отметка комментария из отдельной базы должна менять ETag.'
+    )
+
+
+@pytest.mark.django_db(databases=DATABASES)
+def test_bus_reads_comments_journal(comments_db):
+    received = []
+    bus.reset()
+    bus.poll(force=True)
+    bus.subscribe(received.append)
+    try:
+        # Событие другого воркера в журнале базы комментариев.
+        InvalidationEvent.objects.using('comments').create(key='post:7')
+        bus.poll(force=True)
+    finally:
+        bus.unsubscribe(received.append)
+    assert received == [{'post:7'}], (
+        'Шина должна читать журнал базы комментариев.'
+    )
@@ -0,0 +1,59 @@
+import pytest
+
+from blog.models import VersionStamp
+
+
+@pytest.mark.django_db
+def test_post_detail_returns_304_until_comment_added(
+    client, user, post_with_published_location, mixer
+):
+    post = post_with_published_location
+    url = f'/posts/{post.id}/'
+    response = client.get(url)
+    etag = response['ETag']
+    assert response.has_header('Last-Modified')
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304, (
+        'Неизменённая страница поста должна отдавать 304.'
+    )
+
+    mixer.blend('blog.Comment', post=post, author=user)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_etag_differs_between_users(
+    client, user_client, post_with_published_location
+):
+    anonymous_etag = client.get('/')['ETag']
+    user_etag = user_client.get('/')['ETag']
+    assert anonymous_etag != user_etag
+    response = user_client.get('/', HTTP_IF_NONE_MATCH=anonymous_etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_last_modified_only_for_anonymous(
+    client, user_client, post_with_published_location
+):
+    assert client.get('/').has_header('Last-Modified')
+    response = user_client.get('/')
+    assert response.has_header('ETag')
+    assert not response.has_header('Last-Modified'), (
+        'Last-Modified одинаков для всех пользователей и не должен '
+        'отдаваться персональной странице.'
+    )
+
+
+@pytest.mark.django_db
+def test_read_without_stamps_does_not_write(
+    client, post_with_published_location
+):
+    VersionStamp.objects.all().delete()
+    response = client.get('/')
+    assert response.status_code == 200
+    assert not VersionStamp.objects.exists(), (
+        'GET-запрос не должен создавать отметки изменений.'
+    )
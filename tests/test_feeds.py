@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from blog import feeds
+from blog.models import Post
+
+
+def visible_feed():
+    return feeds.visible_ids(
+        "feed:index",
+        Post.objects.filter(is_published=True, category__is_published=True),
+    )
+
+
+@pytest.mark.django_db
+def test_feed_list_and_cards_are_reused(
+    django_assert_num_queries, post_with_published_location,
+    post_of_another_author
+):
+    ids = visible_feed()
+    assert set(ids) == {
+        post_with_published_location.id, post_of_another_author.id
+    }
+    posts = feeds.hydrate(ids)
+    assert [post.id for post in posts] == ids
+    assert all(hasattr(post, "comment_count") for post in posts)
+    with django_assert_num_queries(0):
+        assert visible_feed() == ids
+        assert [post.id for post in feeds.hydrate(ids)] == ids
+
+
+@pytest.mark.django_db
+def test_changed_post_reloads_only_its_card(
+    django_assert_num_queries, post_with_published_location,
+    post_of_another_author
+):
+    ids = visible_feed()
+    feeds.hydrate(ids)
+    post = post_with_published_location
+    post.title = "Другой заголовок"
+    post.save()
+    with django_assert_num_queries(1):
+        posts = {post.id: post for post in feeds.hydrate(ids)}
+    assert posts[post.id].title == "Другой заголовок", (
+        "Изменённый пост должен перечитываться из базы."
+    )
+
+
+@pytest.mark.django_db
+def test_scheduled_post_appears_without_rebuilding_list(
+    monkeypatch, mixer, user, published_category
+):
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=True, pub_date=timezone.now() + timedelta(hours=1),
+    )
+    assert post.id not in visible_feed()
+    later = timezone.now() + timedelta(hours=2)
+    monkeypatch.setattr(feeds.timezone, "now", lambda: later)
+    assert post.id in visible_feed(), (
+        "Отложенный пост должен появиться в ленте в момент публикации."
+    )
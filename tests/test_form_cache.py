@@ -0,0 +1,34 @@
+import pytest
+
+from blog.forms import PostForm
+from blog.templatetags.blog_tags import (
+    CSRF_PLACEHOLDER, prerendered_comment_form,
+)
+
+
+@pytest.mark.django_db
+def test_comment_form_prerendered_once(
+    user_client, post_with_published_location
+):
+    post = post_with_published_location
+    prerendered_comment_form.cache_clear()
+    for _ in range(2):
+        content = user_client.get(f"/posts/{post.id}/").content.decode()
+        assert f'action="/posts/{post.id}/comment/"' in content
+        assert 'name="csrfmiddlewaretoken"' in content
+        assert CSRF_PLACEHOLDER not in content, (
+            "В готовую форму комментария должен подставляться CSRF-токен."
+        )
+    assert prerendered_comment_form.cache_info().misses == 1
+
+
+@pytest.mark.django_db
+def test_post_form_choices_follow_table_version(mixer, published_category):
+    def category_choices():
+        return [value for value, _ in PostForm().fields["category"].choices]
+
+    assert published_category.pk in category_choices()
+    new_category = mixer.blend("blog.Category", is_published=True)
+    assert new_category.pk in category_choices(), (
+        "Список категорий в форме должен обновляться после записи."
+    )
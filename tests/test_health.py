@@ -0,0 +1,64 @@
+import pytest
+from django.db import OperationalError
+from django.db.migrations.recorder import MigrationRecorder
+
+from blogicum import health
+
+
+@pytest.fixture
+def fresh_health(settings):
+    settings.HEALTH_CACHE_TIMEOUT = 60
+    health.reset()
+    yield
+    health.reset()
+
+
+def test_liveness_without_database(client):
+    # Без django_db любое обращение к базе — ошибка.
+    response = client.get('/health/live/')
+    assert response.status_code == 200
+    assert response.json() == {'status': 'ok'}
+    assert not response.cookies and not response.has_header('Vary'), (
+        'Проба живости не должна проходить через сессии.'
+    )
+
+
+@pytest.mark.django_db
+def test_readiness_cached(fresh_health, client, django_assert_num_queries):
+    response = client.get('/health/ready/')
+    assert response.status_code == 200, response.content
+    assert response.json()['checks'] == {
+        'database': 'ok', 'cache': 'ok', 'migrations': 'ok',
+    }
+    with django_assert_num_queries(0):
+        assert client.get('/health/ready/').status_code == 200, (
+            'Повторная проба готовности должна отвечать из памяти процесса.'
+        )
+
+
+@pytest.mark.django_db
+def test_readiness_fails_without_database(
+    fresh_health, client, monkeypatch
+):
+    def broken():
+        raise OperationalError('unable to open database file')
+
+    monkeypatch.setitem(health.CHECKS, 'database', broken)
+    response = client.get('/health/ready/')
+    assert response.status_code == 503, (
+        'Без доступа к базе проба готовности должна отвечать 503.'
+    )
+    assert response.json()['checks']['database'] == (
+        'fail: OperationalError'
+    )
+
+
+@pytest.mark.django_db
+def test_readiness_fails_with_empty_database(fresh_health, client):
+    # Как пустой файл на месте базы: запрос без таблиц прошёл бы.
+    MigrationRecorder.Migration.objects.all().delete()
+    response = client.get('/health/ready/')
+    assert response.status_code == 503
+    assert response.json()['checks']['database'] == 'fail: RuntimeError', (
+        'Проба готовности должна читать настоящую таблицу базы.'
+    )
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from django.core.cache import cache
+
+from blog import bus
+from blog.cache import feed_cache_key
+from blog.models import InvalidationEvent
+
+
+@pytest.fixture
+def received():
+    keys = []
+    handler = keys.append
+    bus.reset()
+    bus.poll(force=True)
+    bus.subscribe(handler)
+    yield keys
+    bus.unsubscribe(handler)
+
+
+@pytest.mark.django_db
+def test_poll_delivers_events_of_other_workers(received):
+    # Событие, записанное другим воркером напрямую в журнал.
+    InvalidationEvent.objects.create(key="post:42")
+    assert bus.poll(force=True) == 1
+    assert received == [{"post:42"}]
+    assert bus.poll(force=True) == 0, (
+        "Прочитанные события не должны доставляться повторно."
+    )
+
+
+@pytest.mark.django_db
+def test_post_change_publishes_surrogate_keys(
+    received, post_with_published_location
+):
+    post = post_with_published_location
+    post.title = "Новый заголовок"
+    post.save()
+    published = set(
+        InvalidationEvent.objects.values_list("key", flat=True)
+    )
+    assert {
+        f"post:{post.id}", "feed:index",
+        f"category:{post.category.slug}",
+        f"author:{post.author.username}",
+    } <= published
+    assert any(f"post:{post.id}" in keys for keys in received)
+
+
+@pytest.mark.django_db
+def test_cached_feed_dropped_on_new_post(
+    mixer, user, published_category
+):
+    key = feed_cache_key("feed:index")
+    cache.set(key, ([], time.time() + 60), 60)
+    mixer.blend("blog.Post", author=user, category=published_category)
+    assert cache.get(key) is None, (
+        "Новый пост должен сбрасывать закешированный список постов ленты."
+    )
+
+
+@pytest.mark.django_db
+def test_worker_that_missed_journal_drops_everything(received, settings):
+    settings.INVALIDATION_JOURNAL_TTL = 0.01
+    time.sleep(0.02)
+    bus.poll(force=True)
+    assert received == [{bus.ALL}]
@@ -0,0 +1,101 @@
+import socket
+import time
+
+import pytest
+
+from blogicum import metrics, prefork
+
+
+@pytest.fixture
+def overloaded(settings):
+    # Любой запрос уже превышает порог одновременных запросов.
+    settings.LOAD_SHEDDING_MAX_IN_FLIGHT = 0
+    metrics.reset('loadshed.')
+
+
+@pytest.mark.django_db
+def test_deep_anonymous_page_shed_under_load(overloaded, client):
+    response = client.get('/?page=50')
+    assert response.status_code == 503, (
+        'При перегрузке анонимные дальние страницы ленты должны '
+        'получать 503.'
+    )
+    assert response['Retry-After']
+    assert metrics.get('loadshed.rejected.in_flight') == 1
+    assert client.get('/').status_code == 200, (
+        'Обычные запросы при перегрузке должны обслуживаться.'
+    )
+
+
+@pytest.mark.django_db
+def test_admin_changelist_shed_under_load(overloaded, admin_client):
+    assert admin_client.get('/admin/blog/post/').status_code == 503, (
+        'При перегрузке списки объектов в админке должны получать 503.'
+    )
+    assert admin_client.get('/admin/').status_code == 200
+
+
+@pytest.mark.django_db
+def test_logged_in_write_always_admitted(
+    overloaded, user_client, post_with_published_location
+):
+    response = user_client.post(
+        f'/posts/{post_with_published_location.pk}/comment/?page=50',
+        {'text': 'Комментарий'},
+    )
+    assert response.status_code == 302, (
+        'Запись от вошедшего пользователя должна проходить всегда.'
+    )
+
+
+@pytest.mark.django_db
+def test_queue_time_from_proxy_header(client, settings):
+    settings.LOAD_SHEDDING_MAX_QUEUE_TIME = 1.0
+    started = f't={(time.time() - 5) * 1000:.0f}'
+    response = client.get('/?page=50', HTTP_X_REQUEST_START=started)
+    assert response.status_code == 503, (
+        'Запрос, долго ждавший в очереди прокси, должен получать 503.'
+    )
+    fresh = f't={time.time():.3f}'
+    response = client.get('/?page=50', HTTP_X_REQUEST_START=fresh)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_queue_time_header_ignored_from_untrusted_address(client, settings):
+    settings.LOAD_SHEDDING_MAX_QUEUE_TIME = 1.0
+    started = f't={(time.time() - 5) * 1000:.0f}'
+    response = client.get('/?page=50', HTTP_X_REQUEST_START=started,
+                          REMOTE_ADDR='203.0.113.5')
+    assert response.status_code == 200, (
+        'X-Request-Start от клиента, а не от прокси, учитываться не должен.'
+    )
+
+
+@pytest.mark.django_db
+def test_prefork_backlog_used_instead_of_in_flight(
+    overloaded, client, settings
+):
+    settings.LOAD_SHEDDING_MAX_BACKLOG = 10
+    idle = {prefork.BACKLOG_ENVIRON_KEY: lambda: 0}
+    assert client.get('/?page=50', **idle).status_code == 200, (
+        'Под prefork-сервером счётчик запросов процесса не учитывается.'
+    )
+    busy = {prefork.BACKLOG_ENVIRON_KEY: lambda: 11}
+    assert client.get('/?page=50', **busy).status_code == 503
+    assert metrics.get('loadshed.rejected.backlog') == 1
+
+
+@pytest.mark.skipif(not hasattr(socket, 'TCP_INFO'),
+                    reason='TCP_INFO есть только в Linux')
+def test_accept_backlog_counts_waiting_connections():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(8)
+        clients = [socket.create_connection(listener.getsockname())
+                   for _ in range(3)]
+        try:
+            assert prefork.accept_backlog(listener) == 3
+        finally:
+            for sock in clients:
+                sock.close()
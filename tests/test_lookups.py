@@ -0,0 +1,44 @@
+import pytest
+
+from blog import lookups
+from blog.forms import PostForm
+from blog.models import Category
+
+
+@pytest.mark.django_db
+def test_lookups_do_not_query_database(
+    django_assert_num_queries, published_category, published_location
+):
+    lookups.categories.all()
+    lookups.locations.all()
+    with django_assert_num_queries(0):
+        assert lookups.categories.get(
+            slug=published_category.slug
+        ) == published_category
+        assert lookups.locations.get(
+            pk=published_location.pk
+        ) == published_location
+        form = PostForm()
+        choices = [value for value, _ in form.fields["category"].choices]
+        assert published_category.pk in choices
+
+
+@pytest.mark.django_db
+def test_table_refreshed_after_write(published_category):
+    lookups.categories.get(slug=published_category.slug)
+    Category.objects.filter(pk=published_category.pk).update(
+        title="Новое название"
+    )
+    category = lookups.categories.get(slug=published_category.slug)
+    assert category.title == "Новое название", (
+        "Таблица категорий в памяти должна обновляться после записи."
+    )
+
+
+@pytest.mark.django_db
+def test_post_form_rejects_unpublished_category(mixer, published_category):
+    hidden = mixer.blend("blog.Category", is_published=False)
+    data = {"title": "Заголовок", "text": "Текст",
+            "pub_date": "2020-01-01T10:00"}
+    assert PostForm({**data, "category": published_category.pk}).is_valid()
+    assert not PostForm({**data, "category": hidden.pk}).is_valid()
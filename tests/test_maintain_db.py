@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from blog.management.commands import maintain_db
+from blog.management.commands.maintain_db import backup, incremental_vacuum
+
+
+@pytest.fixture
+def database(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'db.sqlite3', isolation_level=None)
+    connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('CREATE TABLE junk (text TEXT)')
+    connection.executemany(
+        'INSERT INTO junk VALUES (?)', [('x' * 1000,)] * 500
+    )
+    yield connection
+    connection.close()
+
+
+def test_backup_in_steps(database, tmp_path):
+    path = tmp_path / 'backup.sqlite3'
+    backup(database, str(path), pages=10, sleep=0, max_restarts=3)
+    copy = sqlite3.connect(path)
+    count, = copy.execute('SELECT COUNT(*) FROM junk').fetchone()
+    copy.close()
+    assert count == 500, 'Резервная копия должна содержать все данные.'
+    assert not (tmp_path / 'backup.sqlite3.part').exists(), (
+        'Временный файл копии должен заменяться готовой копией.'
+    )
+
+
+@pytest.fixture
+def steady_writes(database, tmp_path, monkeypatch):
+    """Запись другим соединением в каждой паузе копирования."""
+    writer = sqlite3.connect(tmp_path / 'db.sqlite3', isolation_level=None)
+    monkeypatch.setattr(maintain_db.time, 'sleep', lambda seconds: (
+        writer.execute("INSERT INTO junk VALUES ('y')")
+    ))
+    yield writer
+    writer.close()
+
+
+def test_backup_restarts_capped(database, steady_writes, tmp_path):
+    path = tmp_path / 'backup.sqlite3'
+    restarts = backup(database, str(path), pages=10, sleep=0, max_restarts=3)
+    assert restarts == 3, (
+        'Копирование должно перезапускаться не больше max_restarts раз.'
+    )
+    copy = sqlite3.connect(path)
+    count, = copy.execute('SELECT COUNT(*) FROM junk').fetchone()
+    copy.close()
+    assert count >= 500, 'Копия одним шагом должна содержать все данные.'
+
+
+def test_backup_without_fallback_fails(database, steady_writes, tmp_path):
+    path = tmp_path / 'backup.sqlite3'
+    with pytest.raises(CommandError):
+        backup(database, str(path), pages=10, sleep=0, max_restarts=3,
+               fallback=False)
+    assert not path.exists(), (
+        'Без перехода на один шаг копия не должна появляться.'
+    )
+    assert not (tmp_path / 'backup.sqlite3.part').exists()
+
+
+def test_incremental_vacuum_respects_budget(database):
+    database.execute('DELETE FROM junk')
+    free, = database.execute('PRAGMA freelist_count').fetchone()
+    freed = incremental_vacuum(
+        database, step=10, budget=50, seconds=10, sleep=0
+    )
+    assert freed == 50 < free, (
+        'Incremental vacuum не должен выходить за бюджет страниц.'
+    )
+    left, = database.execute('PRAGMA freelist_count').fetchone()
+    assert left == free - 50
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_backs_up_site_database(tmp_path):
+    path = tmp_path / 'site.sqlite3'
+    call_command('maintain_db', backup=str(path), analyze=True)
+    copy = sqlite3.connect(path)
+    tables = {name for name, in copy.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )}
+    copy.close()
+    assert 'blog_post' in tables, (
+        'Команда должна копировать базу сайта.'
+    )
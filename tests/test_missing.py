@@ -0,0 +1,73 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from blog.models import Post
+from blogicum import metrics
+
+MISSING_PK = 987654
+
+
+@pytest.fixture
+def no_debug(settings):
+    # Готовая страница 404 отдаётся обработчиком handler404.
+    settings.DEBUG = False
+    metrics.reset('missing.')
+
+
+@pytest.mark.django_db
+def test_missing_post_remembered(
+    no_debug, client, django_assert_num_queries
+):
+    url = f'/posts/{MISSING_PK}/'
+    assert client.get(url).status_code == 404
+    with django_assert_num_queries(0):
+        response = client.get(url)
+    assert response.status_code == 404, (
+        'Повторный запрос несуществующего поста должен получать 404 '
+        'без запросов к базе.'
+    )
+    assert 'Страница не найдена' in response.content.decode()
+    assert metrics.get('missing.hit.post') == 1
+
+
+@pytest.mark.django_db
+def test_created_post_forgotten(
+    no_debug, client, post_with_published_location
+):
+    data = {
+        field.attname: getattr(post_with_published_location, field.attname)
+        for field in Post._meta.concrete_fields
+        if not field.primary_key
+    }
+    url = f'/posts/{MISSING_PK}/'
+    assert client.get(url).status_code == 404
+    Post.objects.create(pk=MISSING_PK, **data)
+    assert client.get(url).status_code == 200, (
+        'Созданный пост должен сразу стать доступен по адресу, который '
+        'раньше отвечал 404.'
+    )
+
+
+@pytest.mark.django_db
+def test_created_user_forgotten(no_debug, client):
+    url = '/profile/newcomer/'
+    assert client.get(url).status_code == 404
+    assert client.get(url).status_code == 404
+    get_user_model().objects.create(username='newcomer')
+    assert client.get(url).status_code == 200, (
+        'Профиль нового пользователя должен сразу стать доступен.'
+    )
+
+
+@pytest.mark.django_db
+def test_hidden_post_not_remembered(
+    no_debug, client, post_with_published_location
+):
+    post_with_published_location.is_published = False
+    post_with_published_location.save()
+    url = f'/posts/{post_with_published_location.pk}/'
+    assert client.get(url).status_code == 404
+    assert client.get(url).status_code == 404
+    assert not metrics.get('missing.stored.post'), (
+        'Скрытый пост существует — его нельзя запоминать как отсутствующий.'
+    )
@@ -0,0 +1,42 @@
+import pytest
+
+from blog.cache import HOLE_RE
+
+
+@pytest.mark.django_db
+def test_shared_page_fills_user_fragments(
+    user_client, another_user_client, client, post_with_published_location
+):
+    post = post_with_published_location
+    url = f"/posts/{post.id}/"
+    edit_url = f"/posts/{post.id}/edit/"
+
+    author_content = user_client.get(url).content.decode()
+    assert edit_url in author_content
+
+    # Повторные запросы берут страницу из кеша.
+    other_content = another_user_client.get(url).content.decode()
+    anonymous_content = client.get(url).content.decode()
+    author_again = user_client.get(url).content.decode()
+
+    assert edit_url not in other_content, (
+        "Ссылка на редактирование из кеша попала к чужому пользователю."
+    )
+    assert "csrfmiddlewaretoken" in other_content
+    assert "csrfmiddlewaretoken" not in anonymous_content
+    assert "/auth/login/" in anonymous_content
+    assert edit_url in author_again
+    for content in (author_content, other_content, anonymous_content):
+        assert not HOLE_RE.search(content)
+
+
+@pytest.mark.django_db
+def test_cached_page_invalidated_on_change(
+    client, post_with_published_location
+):
+    post = post_with_published_location
+    url = f"/posts/{post.id}/"
+    client.get(url)
+    post.title = "Совершенно новый заголовок"
+    post.save()
+    assert post.title in client.get(url).content.decode()
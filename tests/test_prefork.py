@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from blogicum.prefork import PreforkServer
+
+
+def crash():
+    raise RuntimeError('сломанный обработчик')
+
+
+@pytest.fixture
+def server():
+    server = PreforkServer(
+        None, port=0, workers=0, background=crash,
+        background_delay=0.2, background_max_delay=10,
+    )
+    server.bind()
+    server.running = True
+    yield server
+    server.running = False
+    server._stop_children()
+    server.socket.close()
+
+
+def test_crashing_background_restarted_with_delay(server, capfd):
+    server._spawn_missing()
+    server._reap()
+    crashed = time.monotonic()
+    server._spawn_missing()
+    assert server.background_pid is None, (
+        'Упавший фоновый процесс не должен перезапускаться сразу.'
+    )
+    waits = 0
+    while server.background_pid is None:
+        server._reap()
+        server._spawn_missing()
+        waits += 1
+    assert time.monotonic() - crashed >= 0.19
+    assert waits == 1, 'Мастер должен ждать паузу, а не крутиться в цикле.'
+
+    server._reap()
+    assert server.background_next - time.monotonic() > 0.3, (
+        'Пауза должна удваиваться с каждым падением подряд.'
+    )
+    assert 'перезапуск через 0.4 с' in capfd.readouterr().err
+
+
+def test_long_running_background_restarted_at_once(server):
+    server.background_failures = 3
+    server.background_max_delay = 0
+    server._spawn_missing()
+    server._reap()
+    assert server.background_failures == 0
+    server._spawn_missing()
+    assert server.background_pid is not None, (
+        'Долго работавший фоновый процесс перезапускается без паузы.'
+    )
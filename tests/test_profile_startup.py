@@ -0,0 +1,20 @@
+from blog.management.commands.profile_startup import matches, parse_importtime
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     blog.forms\n"
+        "import time:       300 |        420 |   blog.views\n"
+        "some unrelated line\n"
+    )
+    assert parse_importtime(output) == {
+        "blog.forms": (120, 120),
+        "blog.views": (300, 420),
+    }
+
+
+def test_matches_prefix_boundary():
+    assert matches("django.contrib.auth", ["django.contrib"])
+    assert matches("blog", ["blog"])
+    assert not matches("blogicum.settings", ["blog"])
@@ -0,0 +1,47 @@
+import pytest
+from django.db import OperationalError, connection
+
+from blogicum import metrics
+from blogicum.querybudget import budget, query_budget
+
+SLOW_SQL = (
+    'WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL '
+    'SELECT n + 1 FROM numbers WHERE n < 100000000) '
+    'SELECT COUNT(*) FROM numbers'
+)
+
+
+def run_slow_query():
+    with connection.cursor() as cursor:
+        cursor.execute(SLOW_SQL)
+        return cursor.fetchone()
+
+
+@pytest.mark.django_db
+def test_budget_interrupts_slow_query():
+    with pytest.raises(OperationalError, match='interrupted'):
+        with budget(0.05):
+            run_slow_query()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        assert cursor.fetchone() == (1,), (
+            'Соединение должно оставаться рабочим после прерывания запроса.'
+        )
+
+
+@pytest.mark.django_db
+def test_view_over_budget_gets_503(rf):
+    metrics.reset('querybudget.')
+
+    @query_budget(0.05)
+    def slow_view(request):
+        run_slow_query()
+
+    response = slow_view(rf.get('/'))
+    assert response.status_code == 503, (
+        'Представление, превысившее бюджет на запросы, должно отвечать 503.'
+    )
+    assert response['Retry-After']
+    assert metrics.get('querybudget.exceeded.slow_view') == 1, (
+        'Превышение бюджета должно учитываться в счётчиках.'
+    )
@@ -0,0 +1,63 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from blog.models import Category, InvalidationEvent, Post
+from blog.querycache import cached, stats
+from blogicum import metrics
+
+
+@pytest.mark.django_db
+def test_repeated_query_served_from_cache(
+    django_assert_num_queries, published_category
+):
+    queryset = cached(Category.objects.filter(is_published=True))
+    assert list(queryset) == [published_category]
+    queryset.get(pk=published_category.pk)
+    before = stats()["blog_category"]["hits"]
+    with django_assert_num_queries(0):
+        assert list(queryset.all()) == [published_category]
+        assert queryset.get(pk=published_category.pk) == published_category
+    assert stats()["blog_category"]["hits"] == before + 2
+
+
+@pytest.mark.django_db
+def test_write_to_table_invalidates_cached_queries(published_category):
+    queryset = cached(Category.objects.filter(is_published=True))
+    assert list(queryset.all()) == [published_category]
+    # update() не отправляет сигналы, но запись в таблицу видна.
+    Category.objects.filter(pk=published_category.pk).update(
+        is_published=False
+    )
+    assert list(queryset.all()) == [], (
+        "Запись в таблицу должна сбрасывать закешированные запросы к ней."
+    )
+
+
+@pytest.mark.django_db
+def test_queries_to_other_tables_are_not_cached(
+    django_assert_num_queries, post_with_published_location
+):
+    queryset = cached(Post.objects.all())
+    list(queryset)
+    with django_assert_num_queries(1):
+        list(queryset.all())
+
+
+@pytest.mark.django_db
+def test_users_not_cached_and_login_not_invalidating(client, user):
+    metrics.reset('querycache.')
+    user.set_password('password-123')
+    user.save()
+    events = InvalidationEvent.objects.count()
+    client.login(username=user.username, password='password-123')
+    assert not metrics.get('querycache.invalidations.auth_user'), (
+        'Вход пользователя не должен сбрасывать кеш запросов.'
+    )
+    assert InvalidationEvent.objects.count() == events, (
+        'Вход пользователя не должен писать в журнал шины.'
+    )
+    list(cached(get_user_model().objects.all()))
+    assert 'auth_user' not in stats(), (
+        'Строки пользователей (с хешами паролей) не должны попадать в '
+        'общий кеш.'
+    )
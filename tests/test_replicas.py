@@ -0,0 +1,172 @@
+import fcntl
+import sqlite3
+import time
+
+import pytest
+from django.db import connections
+
+from blog import replicas
+from blog.cache import tag_versions
+from blog.models import InvalidationEvent, Post
+from blog.replicas import ReplicaRouter
+
+
+@pytest.fixture
+def replica(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ['replica']
+    replicas.reset()
+    monkeypatch.setattr(
+        replicas, '_name',
+        lambda alias: 'file:test-replica?mode=memory&cache=shared',
+    )
+    replicas._targets['replica'] = sqlite3.connect(
+        ':memory:', check_same_thread=False
+    )
+    yield replicas._targets['replica']
+    replicas.reset()
+
+
+@pytest.fixture
+def shared_replica(replica, monkeypatch, tmp_path):
+    # Файловая реплика: отметка и блокировка общие для процессов.
+    path = tmp_path / 'replica.sqlite3'
+    monkeypatch.setattr(replicas, '_name', lambda alias: str(path))
+    return path
+
+
+@pytest.fixture
+def replica_connection(replica, monkeypatch):
+    # Алиас Django для реплики: читает ту же базу в памяти, куда
+    # копирует refresh().
+    name = replicas._name('replica')
+    replica.close()
+    replicas._targets['replica'] = sqlite3.connect(
+        name, uri=True, check_same_thread=False
+    )
+    monkeypatch.setitem(connections.settings, 'replica', {
+        **connections.settings['default'], 'NAME': name,
+    })
+    yield
+    connections['replica'].close()
+    del connections['replica']
+
+
+def test_router_reads_from_ready_replica(replica):
+    router = ReplicaRouter()
+    assert router.db_for_read(Post) is None, (
+        'Реплика без копии базы не должна использоваться.'
+    )
+    replicas.write_state('replica', {'synced': time.time(), 'cursor': 0})
+    assert router.db_for_read(Post) == 'replica', (
+        'Чтение постов должно идти с реплики.'
+    )
+    assert router.db_for_read(InvalidationEvent) is None, (
+        'Журнал шины должен читаться из основной базы.'
+    )
+    assert router.db_for_write(Post) is None
+    with replicas.pin_primary():
+        assert router.db_for_read(Post) is None, (
+            'После записи сессия должна читать из основной базы.'
+        )
+    replicas.write_state('replica', {'synced': time.time() - 3600,
+                                     'cursor': 0})
+    assert router.db_for_read(Post) is None, (
+        'Давно не обновлявшаяся реплика не должна использоваться.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_copies_primary(replica, post_with_published_location):
+    replicas.refresh('replica')
+    title, = replica.execute(
+        'SELECT title FROM blog_post WHERE id = ?',
+        (post_with_published_location.pk,),
+    ).fetchone()
+    assert title == post_with_published_location.title, (
+        'Реплика должна содержать копию основной базы.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_expires_tags_changed_since_last_copy(replica):
+    replicas.refresh('replica')
+    before = tag_versions(['post:1'])['post:1']
+    InvalidationEvent.objects.create(key='post:1')
+    replicas.refresh('replica')
+    after = tag_versions(['post:1'])['post:1']
+    assert after != before, (
+        'Кеш, собранный из отстающей реплики, должен сбрасываться '
+        'после её обновления.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_copy_keeps_changed_tags(replica, monkeypatch):
+    replicas.refresh('replica')
+    before = tag_versions(['post:1'])['post:1']
+    InvalidationEvent.objects.create(key='post:1')
+
+    def broken(alias):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(replicas, '_target', broken)
+        with pytest.raises(sqlite3.OperationalError):
+            replicas.refresh('replica')
+    replicas.refresh('replica')
+    assert tag_versions(['post:1'])['post:1'] != before, (
+        'Неудачная копия не должна терять изменённые теги.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_file_replica_refreshed_by_one_process(shared_replica, settings):
+    settings.REPLICA_REFRESH_INTERVAL = 60
+    assert replicas.refresh_stale() == ['replica']
+    replicas.reset()
+    # Другой процесс видит общую отметку и не копирует базу снова.
+    assert replicas.ready_replicas() == ['replica']
+    assert replicas.refresh_stale() == []
+    with open(f'{shared_replica}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert replicas.refresh_stale(force=True) == [], (
+            'Пока реплику обновляет другой процесс, копировать нельзя.'
+        )
+
+
+@pytest.mark.django_db
+def test_write_sets_sticky_cookie(
+    settings, monkeypatch, user_client, post_with_published_location
+):
+    settings.DATABASE_REPLICAS = ['replica']
+    monkeypatch.setattr(replicas, 'start', lambda: None)
+    response = user_client.post(
+        f'/posts/{post_with_published_location.pk}/comment/',
+        {'text': 'Комментарий'},
+    )
+    assert settings.REPLICA_STICKY_COOKIE in response.cookies, (
+        'После записи сессия должна закрепляться за основной базой.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writer_reads_own_comment_after_replica_read(
+    replica_connection, settings, monkeypatch, client, user_client,
+    post_with_published_location
+):
+    monkeypatch.setattr(replicas, 'start', lambda: None)
+    post = post_with_published_location
+    url = f'/posts/{post.pk}/'
+    replicas.refresh('replica')
+    user_client.post(f'{url}comment/', {'text': 'Свежий комментарий'})
+    # Другой посетитель читает с отстающей реплики.
+    assert 'Свежий комментарий' not in client.get(url).content.decode()
+    response = user_client.get(url)
+    assert 'Свежий комментарий' in response.content.decode(), (
+        'Писавшая сессия должна видеть свои изменения, даже если страницу '
+        'только что собрали из отстающей реплики.'
+    )
+    replicas.reset()
+    assert 'Свежий комментарий' in client.get(url).content.decode(), (
+        'Страница из отстающей реплики не должна попадать в общий кеш.'
+    )
@@ -0,0 +1,39 @@
+import pytest
+from django.template import Context, Template
+from django.urls import NoReverseMatch, reverse
+
+from blogicum import reversal
+
+
+@pytest.mark.parametrize(
+    "name, args, kwargs",
+    [
+        ("blog:index", (), {}),
+        ("blog:post_detail", (), {"pk": 42}),
+        ("blog:edit_comment", (1, 2), {}),
+        ("blog:category_posts", ("travel",), {}),
+        ("profile", ("пользователь 1",), {}),
+        ("pages:rules", (), {}),
+        ("password_reset_confirm", (), {"uidb64": "MQ", "token": "t-1"}),
+    ],
+)
+def test_matches_django_reverse(name, args, kwargs):
+    assert reversal.reverse(name, args, kwargs) == reverse(
+        name, args=args, kwargs=kwargs
+    )
+
+
+def test_invalid_values_raise_no_reverse_match():
+    with pytest.raises(NoReverseMatch):
+        reversal.reverse("blog:post_detail", ["abc"])
+    with pytest.raises(NoReverseMatch):
+        reversal.reverse("blog:unknown")
+
+
+def test_fast_url_tag():
+    template = Template(
+        "{% load blog_tags %}"
+        "{% fast_url 'blog:post_detail' pk=pk %}|"
+        "{% fast_url 'blog:unknown' as missing %}{{ missing }}"
+    )
+    assert template.render(Context({"pk": 5})) == "/posts/5/|"
@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from blogicum.sqlite import apply_pragmas
+
+
+def test_connection_pragmas(db):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        synchronous, = cursor.fetchone()
+        cursor.execute('PRAGMA busy_timeout')
+        busy_timeout, = cursor.fetchone()
+        cursor.execute('PRAGMA temp_store')
+        temp_store, = cursor.fetchone()
+    assert synchronous == 1, (
+        'Убедитесь, что соединения с SQLite работают с synchronous=NORMAL.'
+    )
+    assert busy_timeout == 5000, (
+        'Убедитесь, что соединения с SQLite ждут снятия блокировки.'
+    )
+    assert temp_store == 2, (
+        'Убедитесь, что временные таблицы SQLite хранятся в памяти.'
+    )
+
+
+def test_apply_pragmas_enables_wal(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'db.sqlite3')
+    applied = apply_pragmas(
+        connection.cursor(), {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}
+    )
+    connection.close()
+    assert applied['journal_mode'] == 'wal', (
+        'Убедитесь, что файл базы переводится в режим WAL.'
+    )
+    assert applied['synchronous'] == 1
+
+
+def test_bench_rejects_too_few_rows():
+    with pytest.raises(CommandError, match='--rows'):
+        call_command('bench_sqlite', '--rows', '5', '--duration', '0')
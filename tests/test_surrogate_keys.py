@@ -0,0 +1,61 @@
+import pytest
+from django.contrib.admin.sites import site
+
+from blog.cache import purge
+from blog.models import Category
+
+
+def rendered(response):
+    return "blog/detail.html" in [t.name for t in response.templates]
+
+
+@pytest.mark.django_db
+def test_pages_send_surrogate_key_header(
+    client, post_with_published_location
+):
+    post = post_with_published_location
+    for url in ("/", f"/posts/{post.id}/"):
+        tags = set(client.get(url)["Surrogate-Key"].split())
+        assert {
+            f"post:{post.id}",
+            f"author:{post.author.username}",
+            f"category:{post.category.slug}",
+            f"location:{post.location_id}",
+        } <= tags, f"Страница `{url}` должна отдавать теги своих постов."
+    assert "feed:index" in client.get("/")["Surrogate-Key"].split()
+
+
+@pytest.mark.django_db
+def test_purge_drops_only_tagged_pages(
+    client, post_with_published_location, post_of_another_author
+):
+    first, second = post_with_published_location, post_of_another_author
+    client.get(f"/posts/{first.id}/")
+    client.get(f"/posts/{second.id}/")
+    purge(f"post:{first.id}")
+    assert rendered(client.get(f"/posts/{first.id}/")), (
+        "Страница с тегом из purge() должна рендериться заново."
+    )
+    assert not rendered(client.get(f"/posts/{second.id}/")), (
+        "Страница без тегов из purge() должна остаться в кеше."
+    )
+
+
+@pytest.mark.django_db
+def test_admin_unpublish_purges_category_pages(
+    client, admin_user, rf, post_with_published_location
+):
+    post = post_with_published_location
+    url = f"/posts/{post.id}/"
+    assert client.get(url).status_code == 200
+
+    model_admin = site._registry[Category]
+    request = rf.post("/admin/")
+    request.user = admin_user
+    model_admin.unpublish(
+        request, Category.objects.filter(pk=post.category_id)
+    )
+    assert client.get(url).status_code == 404, (
+        "После снятия категории с публикации закешированная страница "
+        "её поста не должна отдаваться."
+    )
@@ -0,0 +1,144 @@
+import os
+from datetime import timedelta
+from io import BytesIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from PIL import Image
+
+from blog import tasks
+from blog.models import Comment, Post, Task
+
+calls = []
+
+
+@tasks.register
+def remember_call(value):
+    calls.append(value)
+
+
+@tasks.register
+def always_fails():
+    raise RuntimeError('сбой')
+
+
+@pytest.mark.django_db
+def test_claim_by_priority_and_schedule():
+    low = tasks.enqueue('remember_call', value='low')
+    high = tasks.enqueue('remember_call', priority=10, value='high')
+    tasks.enqueue('remember_call', value='later',
+                  run_at=timezone.now() + timedelta(hours=1))
+    claimed = tasks.claim('first', limit=3)
+    assert [task.pk for task in claimed] == [high.pk, low.pk], (
+        'Задачи должны браться по приоритету и не раньше run_at.'
+    )
+    assert tasks.claim('second', limit=3) == [], (
+        'Взятая задача не должна достаться другому обработчику.'
+    )
+
+
+@pytest.mark.django_db
+def test_released_task_not_finished_by_old_worker(settings):
+    settings.TASK_LOCK_TIMEOUT = 0
+    tasks.enqueue('remember_call', value='slow')
+    stale = tasks.claim('first')[0]
+    assert tasks.release_stale() == 1
+    current = tasks.claim('second')[0]
+    tasks.run(stale)
+    current.refresh_from_db()
+    assert current.status == Task.RUNNING, (
+        'Обработчик, у которого забрали задачу, не должен её удалять.'
+    )
+
+
+@pytest.mark.django_db
+def test_failed_task_retried_with_backoff(settings):
+    settings.TASK_MAX_ATTEMPTS = 2
+    settings.TASK_RETRY_DELAY = 30
+    task = tasks.enqueue('always_fails')
+    assert tasks.run(tasks.claim('worker')[0]) is False
+    task.refresh_from_db()
+    assert task.status == Task.QUEUED and task.attempts == 1
+    assert task.run_at > timezone.now() + timedelta(seconds=25), (
+        'Упавшая задача должна повторяться с задержкой.'
+    )
+    assert 'сбой' in task.last_error
+
+    Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+    tasks.run(tasks.claim('worker')[0])
+    task.refresh_from_db()
+    assert task.status == Task.FAILED, (
+        'После TASK_MAX_ATTEMPTS попыток задача должна остаться failed.'
+    )
+
+
+@pytest.mark.django_db
+def test_delete_post_defers_comments(
+    user_client, post_with_published_location, mixer
+):
+    post = post_with_published_location
+    mixer.cycle(3).blend(Comment, post=post, author=post.author)
+    response = user_client.post(f'/posts/{post.pk}/delete/')
+    assert response.status_code == 302
+    assert not Post.objects.filter(pk=post.pk).exists(), (
+        'Пост должен удаляться сразу.'
+    )
+    assert Comment.objects.filter(post_id=post.pk).count() == 3
+    tasks.run_pending()
+    assert not Comment.objects.filter(post_id=post.pk).exists(), (
+        'Комментарии удалённого поста должна удалить фоновая задача.'
+    )
+
+
+@pytest.mark.django_db
+def test_password_reset_email_queued(client):
+    get_user_model().objects.create_user(
+        'resetter', 'resetter@example.com', 'password-123'
+    )
+    response = client.post('/auth/password_reset/',
+                           {'email': 'resetter@example.com'})
+    assert response.status_code == 302
+    assert not mail.outbox, 'Письмо не должно отправляться в запросе.'
+    tasks.run_pending()
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == ['resetter@example.com']
+
+
+@pytest.mark.django_db
+def test_uploaded_image_downscaled(
+    settings, tmp_path, post_with_published_location
+):
+    settings.MEDIA_ROOT = tmp_path
+    settings.POST_IMAGE_MAX_SIZE = 100
+    buffer = BytesIO()
+    Image.new('RGB', (400, 200)).save(buffer, format='PNG')
+    post = post_with_published_location
+    post.image = SimpleUploadedFile('big.png', buffer.getvalue())
+    post.save()
+    original = post.image.path
+    tasks.enqueue('process_image', post_id=post.pk)
+    tasks.run_pending()
+    post.refresh_from_db()
+    with Image.open(post.image.path) as image:
+        assert image.size == (100, 50), (
+            'Изображение поста должно уменьшаться в фоне.'
+        )
+    assert post.image.path != original
+    assert not os.path.exists(original), (
+        'Исходный файл должен удаляться после замены ссылки на новый.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_command_drains_queue():
+    calls.clear()
+    for value in range(5):
+        tasks.enqueue('remember_call', value=value)
+    call_command('run_tasks', '--once', '--threads', '2',
+                 '--poll-interval', '0.01')
+    assert sorted(calls) == list(range(5))
+    assert not Task.objects.exists()
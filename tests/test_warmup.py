@@ -0,0 +1,16 @@
+from django.template import engines
+
+from blogicum import warmup
+
+
+def test_all_templates_compile():
+    compiled, failed = warmup.compile_templates()
+    assert compiled > 0, "Прогрев не нашёл ни одного шаблона."
+    assert failed == 0, "При прогреве часть шаблонов не скомпилировалась."
+
+
+def test_template_names_include_project_templates():
+    backend = engines["django"]
+    names = set(warmup.iter_template_names(backend))
+    assert "base.html" in names
+    assert "includes/post_card.html" in names